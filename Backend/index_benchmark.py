@@ -0,0 +1,235 @@
+"""
+Benchmarks Milvus vector index configurations on real vectors.
+
+Samples vectors from an existing collection, computes exact L2 nearest
+neighbours with numpy as ground truth, then builds each candidate index on a
+scratch copy and measures recall@k, QPS, p99 latency, build time and loaded
+memory. With --apply, the Pareto-best configuration that meets --min-recall
+is rolled out as a new collection version behind the alias (see
+manage_collections.py reindex), so searches keep hitting the old version
+until the new one is loaded and warm.
+
+    python index_benchmark.py --collection gemini_rag_collection --field vector
+    python index_benchmark.py --collection whatsapp_collection --field embedding --apply
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, connections, utility
+
+from manage_collections import SPECS, alias_target, load, reindex
+
+load_dotenv()
+
+METRIC_TYPE = "L2"
+
+CANDIDATES = [
+    {"index_type": "IVF_FLAT", "params": {"nlist": nlist}, "search": [{"nprobe": n} for n in (8, 16, 64)]}
+    for nlist in (128, 1024)
+] + [
+    {"index_type": "IVF_SQ8", "params": {"nlist": nlist}, "search": [{"nprobe": n} for n in (8, 16, 64)]}
+    for nlist in (128, 1024)
+] + [
+    {"index_type": "IVF_PQ", "params": {"nlist": nlist, "m": m, "nbits": 8}, "search": [{"nprobe": n} for n in (16, 64)]}
+    for nlist in (128, 1024) for m in (16, 32)
+] + [
+    {"index_type": "HNSW", "params": {"M": M, "efConstruction": 200}, "search": [{"ef": ef} for ef in (32, 64, 128)]}
+    for M in (16, 32)
+]
+
+
+def sample_vectors(collection, field, limit):
+    iterator = collection.query_iterator(batch_size=1000, output_fields=[field])
+    vectors = []
+    while len(vectors) < limit:
+        rows = iterator.next()
+        if not rows:
+            break
+        vectors.extend(row[field] for row in rows)
+    iterator.close()
+    return np.asarray(vectors[:limit], dtype=np.float32)
+
+
+def exact_neighbours(base, queries, k):
+    # ||q - b||^2 = ||q||^2 - 2 q.b + ||b||^2; the ||q||^2 term doesn't change the ranking
+    distances = -2 * queries @ base.T + (base ** 2).sum(axis=1)
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def build_scratch_collection(name, base):
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+    fields = [
+        FieldSchema(name="pk", dtype=DataType.INT64, is_primary=True),
+        FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=base.shape[1]),
+    ]
+    scratch = Collection(name=name, schema=CollectionSchema(fields, description="Index benchmark scratch copy"))
+    for start in range(0, len(base), 1000):
+        chunk = base[start:start + 1000]
+        scratch.insert([list(range(start, start + len(chunk))), chunk.tolist()])
+    scratch.flush()
+    return scratch
+
+
+def loaded_memory_bytes(collection_name):
+    return sum(segment.mem_size for segment in utility.get_query_segment_info(collection_name))
+
+
+def benchmark_candidate(scratch, candidate, queries, truth, k):
+    index_params = {"index_type": candidate["index_type"], "metric_type": METRIC_TYPE, "params": candidate["params"]}
+    started = time.perf_counter()
+    scratch.create_index(field_name="vector", index_params=index_params)
+    utility.wait_for_index_building_complete(scratch.name)
+    build_seconds = time.perf_counter() - started
+    scratch.load()
+    memory = loaded_memory_bytes(scratch.name)
+
+    results = []
+    for search_params in candidate["search"]:
+        latencies = []
+        hits = 0
+        for query, expected in zip(queries, truth):
+            t0 = time.perf_counter()
+            found = scratch.search(
+                data=[query.tolist()],
+                anns_field="vector",
+                param={"metric_type": METRIC_TYPE, "params": search_params},
+                limit=k,
+            )
+            latencies.append(time.perf_counter() - t0)
+            hits += len(set(found[0].ids) & set(expected.tolist()))
+        results.append({
+            "index_type": candidate["index_type"],
+            "build_params": candidate["params"],
+            "search_params": search_params,
+            f"recall@{k}": round(hits / (len(queries) * k), 4),
+            "qps": round(len(queries) / sum(latencies), 1),
+            "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 2),
+            "build_seconds": round(build_seconds, 2),
+            "memory_mb": round(memory / 2 ** 20, 1),
+        })
+
+    scratch.release()
+    scratch.drop_index()
+    return results
+
+
+def pareto_front(results, k):
+    """Configurations not beaten on recall, p99 latency and memory all at once."""
+    recall = f"recall@{k}"
+
+    def dominates(a, b):
+        better_or_equal = a[recall] >= b[recall] and a["p99_ms"] <= b["p99_ms"] and a["memory_mb"] <= b["memory_mb"]
+        strictly = a[recall] > b[recall] or a["p99_ms"] < b["p99_ms"] or a["memory_mb"] < b["memory_mb"]
+        return better_or_equal and strictly
+
+    return [r for r in results if not any(dominates(other, r) for other in results)]
+
+
+def pick_best(results, k, min_recall):
+    """The highest-QPS Pareto configuration that reaches min_recall."""
+    eligible = [r for r in pareto_front(results, k) if r[f"recall@{k}"] >= min_recall]
+    return max(eligible, key=lambda r: r["qps"]) if eligible else None
+
+
+def apply_index(collection, field, best, files=None):
+    """
+    Rolls best out to collection. An aliased collection gets a blue/green
+    reindex with the new index; the previous version is kept for rollback.
+    Anything else that is live behind an alias is refused, and only
+    collections nothing serves from are rebuilt in place.
+    """
+    index_params = {"index_type": best["index_type"], "metric_type": METRIC_TYPE, "params": best["build_params"]}
+    spec = SPECS.get(collection.name)
+    if spec and spec["vector_field"] == field and alias_target(collection.name):
+        reindex(collection.name, files=files, keep=1, index_params=index_params)
+        print(f"Keep it on later rebuilds with: python manage_collections.py reindex {collection.name} "
+              f"--index-params '{json.dumps(index_params)}'")
+        return True
+    if alias_target(collection.name) or utility.list_aliases(collection.name):
+        print(f"Refusing to rebuild '{collection.name}' in place: it is live behind an alias.")
+        return False
+
+    collection.release()
+    for index in collection.indexes:
+        if index.field_name == field:
+            collection.drop_index(index_name=index.index_name)
+    # Named like manage_collections' indexes; an unnamed wait is ambiguous next to scalar indexes
+    index_name = f"{field}_index"
+    collection.create_index(field_name=field, index_params=index_params, index_name=index_name)
+    utility.wait_for_index_building_complete(collection.name, index_name=index_name)
+    collection.load()
+    return True
+
+
+def print_table(results, k):
+    header = f"{'index':<9} {'build params':<34} {'search':<14} {'recall':>7} {'qps':>8} {'p99 ms':>8} {'build s':>8} {'mem MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['index_type']:<9} {json.dumps(r['build_params']):<34} {json.dumps(r['search_params']):<14} "
+              f"{r[f'recall@{k}']:>7} {r['qps']:>8} {r['p99_ms']:>8} {r['build_seconds']:>8} {r['memory_mb']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Milvus index types on a collection's vectors.")
+    parser.add_argument("--collection", default="gemini_rag_collection")
+    parser.add_argument("--field", default="vector", help="vector field to benchmark")
+    parser.add_argument("--sample", type=int, default=20000, help="vectors to sample as the base set")
+    parser.add_argument("--queries", type=int, default=200, help="held-out vectors used as queries")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    parser.add_argument("--json", help="write all results to this file")
+    parser.add_argument("--apply", action="store_true", help="roll the best configuration out to the collection")
+    parser.add_argument("--files", nargs="*", help="corpus files to re-embed when applying to gemini_rag_collection")
+    args = parser.parse_args()
+
+    connections.connect(host=os.getenv("MILVUS_HOST", "localhost"), port=os.getenv("MILVUS_PORT", "19530"))
+    collection = Collection(name=args.collection)
+    load(collection)
+
+    vectors = sample_vectors(collection, args.field, args.sample + args.queries)
+    if len(vectors) <= args.queries:
+        print(f"Collection '{args.collection}' has only {len(vectors)} vectors; need more than {args.queries}.")
+        return
+    rng = np.random.default_rng(0)
+    rng.shuffle(vectors)
+    queries, base = vectors[:args.queries], vectors[args.queries:]
+    k = min(args.k, len(base))
+    truth = exact_neighbours(base, queries, k)
+    print(f"Sampled {len(base)} base vectors and {len(queries)} queries (dim {base.shape[1]}).")
+
+    scratch_name = f"{args.collection}_index_bench"
+    scratch = build_scratch_collection(scratch_name, base)
+    results = []
+    try:
+        for candidate in CANDIDATES:
+            if candidate["index_type"] == "IVF_PQ" and base.shape[1] % candidate["params"]["m"]:
+                continue
+            if candidate["params"].get("nlist", 0) > len(base):
+                continue
+            print(f"Benchmarking {candidate['index_type']} {candidate['params']}...")
+            results.extend(benchmark_candidate(scratch, candidate, queries, truth, k))
+    finally:
+        utility.drop_collection(scratch_name)
+
+    print_table(results, k)
+    best = pick_best(results, k, args.min_recall)
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump({"results": results, "best": best}, out, indent=2)
+
+    if best is None:
+        print(f"No configuration reached recall@{k} >= {args.min_recall}.")
+        return
+    print(f"\nBest: {best['index_type']} {best['build_params']}, search with {best['search_params']}")
+    if args.apply and apply_index(collection, args.field, best, files=args.files):
+        print(f"Applied to '{args.collection}.{args.field}'. Use search params {best['search_params']}.")
+
+
+if __name__ == "__main__":
+    main()
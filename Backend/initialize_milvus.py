@@ -1,10 +1,16 @@
+import argparse
+import glob
+import hashlib
+import json
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+import tiktoken
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_milvus import Milvus
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain.docstore.document import Document
-from pymilvus import connections
+from pymilvus import Collection, connections
+from manage_collections import alias_target
 import getpass # Import getpass for securely entering API key
 
 load_dotenv()
@@ -13,29 +19,168 @@ load_dotenv()
 if "GOOGLE_API_KEY" not in os.environ:
     os.environ["GOOGLE_API_KEY"] = getpass.getpass("Enter your Google API key: ")
 
-def load_documents(file_path):
-    with open(file_path, 'r') as file:
-        content = file.read()
-    return content
+CHUNK_SIZE = 500  # tokens
+MANIFEST_PATH = "ingest_manifest.json"
 
-file_path = 'fnmoney.txt'
-document_text = load_documents(file_path)
+encoding = tiktoken.get_encoding("gpt2")
+text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(chunk_size=CHUNK_SIZE, chunk_overlap=0)
 
-docs = [Document(page_content=document_text)]
 
-# Correctly initialize the Google embedding model
-embedding = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
+def iter_paragraphs(file_path):
+    """Yields blank-line separated paragraphs without reading the whole file."""
+    lines = []
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                lines.append(line.rstrip())
+            elif lines:
+                yield "\n".join(lines)
+                lines = []
+    if lines:
+        yield "\n".join(lines)
 
-text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(chunk_size=500, chunk_overlap=0)
-split_docs = text_splitter.split_documents(docs)
 
-connections.connect(host='localhost', port='19530')
+def iter_chunks(file_path):
+    """
+    Packs whole paragraphs into chunks of up to CHUNK_SIZE tokens, splitting
+    only paragraphs that are too long on their own. Chunks break at
+    paragraph boundaries, so an edit to one paragraph changes only the
+    chunks around it, not everything after it.
+    """
+    current, current_tokens = [], 0
+    for paragraph in iter_paragraphs(file_path):
+        tokens = len(encoding.encode(paragraph))
+        if tokens > CHUNK_SIZE:
+            if current:
+                yield "\n\n".join(current)
+                current, current_tokens = [], 0
+            yield from text_splitter.split_text(paragraph)
+            continue
+        if current_tokens + tokens > CHUNK_SIZE and current:
+            yield "\n\n".join(current)
+            current, current_tokens = [], 0
+        current.append(paragraph)
+        current_tokens += tokens
+    if current:
+        yield "\n\n".join(current)
 
-# Use the new collection name
-vector_store = Milvus.from_documents(
-    documents=split_docs,
-    collection_name="gemini_rag_collection", # <-- IMPORTANT: Use the new collection name
-    embedding=embedding,
-)
 
-print("Documents have been successfully embedded and stored in Milvus.")
\ No newline at end of file
+def chunk_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def load_manifest(path, collection_name):
+    if os.path.exists(path):
+        with open(path, 'r') as file:
+            manifest = json.load(file)
+        if manifest.get("collection") == collection_name:
+            return manifest
+    return {"collection": collection_name, "sources": {}}
+
+
+def save_manifest(manifest, path):
+    # Write-then-rename so an interrupted run never leaves a torn checkpoint
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump(manifest, file)
+    os.replace(tmp_path, path)
+
+
+def iter_batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest(paths, collection_name, manifest_path=MANIFEST_PATH, batch_size=64, concurrency=4, prune=False):
+    """
+    Embeds and inserts every chunk of paths that isn't already in the
+    collection. The manifest maps each source file to {chunk hash: primary
+    key}. It is checkpointed after every inserted batch, so an
+    interrupted run resumes where it stopped. Chunks that disappeared from a
+    file are deleted from the collection.
+    """
+    embedding = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
+    collection = Collection(name=collection_name)
+    manifest = load_manifest(manifest_path, collection_name)
+    inserted = skipped = deleted = 0
+
+    def embed(batch):
+        return batch, embedding.embed_documents([text for _, text in batch])
+
+    def store(future):
+        nonlocal inserted
+        batch, vectors = future.result()
+        result = collection.insert([{"text": text, "vector": vector} for (_, text), vector in zip(batch, vectors)])
+        for (digest, _), pk in zip(batch, result.primary_keys):
+            known[digest] = pk
+        inserted += len(batch)
+        save_manifest(manifest, manifest_path)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for path in paths:
+            known = manifest["sources"].setdefault(path, {})
+            seen = set()
+
+            def pending_chunks():
+                nonlocal skipped
+                for text in iter_chunks(path):
+                    digest = chunk_hash(text)
+                    if digest in seen:
+                        continue
+                    seen.add(digest)
+                    if digest in known:
+                        skipped += 1
+                        continue
+                    yield digest, text
+
+            in_flight = deque()
+            for batch in iter_batches(pending_chunks(), batch_size):
+                in_flight.append(executor.submit(embed, batch))
+                if len(in_flight) >= concurrency:
+                    store(in_flight.popleft())
+            while in_flight:
+                store(in_flight.popleft())
+
+            stale = [digest for digest in known if digest not in seen]
+            if stale:
+                collection.delete(f"pk in {[known[digest] for digest in stale]}")
+                for digest in stale:
+                    del known[digest]
+                deleted += len(stale)
+                save_manifest(manifest, manifest_path)
+
+    if prune:
+        for path in [source for source in manifest["sources"] if source not in paths]:
+            pks = list(manifest["sources"].pop(path).values())
+            if pks:
+                collection.delete(f"pk in {pks}")
+            deleted += len(pks)
+        save_manifest(manifest, manifest_path)
+
+    collection.flush()
+    return inserted, skipped, deleted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally embed text files into Milvus.")
+    parser.add_argument("files", nargs="*", default=["fnmoney.txt"], help="files or glob patterns to ingest")
+    parser.add_argument("--collection", default="gemini_rag_collection")
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    parser.add_argument("--batch-size", type=int, default=64, help="chunks per embedding request")
+    parser.add_argument("--concurrency", type=int, default=4, help="embedding requests in flight")
+    parser.add_argument("--prune", action="store_true", help="delete chunks of files not listed")
+    args = parser.parse_args()
+
+    paths = sorted({path for pattern in args.files for path in glob.glob(pattern)})
+    connections.connect(host=os.getenv("MILVUS_HOST", "localhost"), port=os.getenv("MILVUS_PORT", "19530"))
+    # The manifest records primary keys of one physical collection, so resolve aliases
+    collection_name = alias_target(args.collection) or args.collection
+    inserted, skipped, deleted = ingest(paths, collection_name, args.manifest, args.batch_size, args.concurrency,
+                                        args.prune)
+    print(f"Ingested {len(paths)} files: {inserted} chunks embedded, {skipped} unchanged, {deleted} removed.")
@@ -17,6 +17,8 @@ from twilio.rest import Client
 import re
 import logging
 import asyncio
+from rag_warmup import RAG_REPLICAS, WARMUP_RETRY_SECONDS, WARMUP_WAIT_SECONDS, warm_up_rag
+from retrieval import Retriever
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,6 +26,8 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 API_BASE_URL = "http://localhost:8001/v1/api"
+# fnBill list endpoints return one page at a time; the API caps a page at 1000
+FNBILL_PAGE_SIZE = 1000
 TWILIO_ACCOUNT_SID=os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN=os.getenv("TWILIO_AUTH_TOKEN")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
@@ -42,8 +46,41 @@ app.add_middleware(
 
 embedding = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=GOOGLE_API_KEY)
 connections.connect(host='localhost', port='19530')
-vector_store = Milvus(embedding_function=embedding, collection_name="gemini_rag_collection") # <-- Use new collection name
+# Same replica count as warm_up_rag; Milvus rejects a load that changes it
+vector_store = Milvus(embedding_function=embedding, collection_name="gemini_rag_collection", # <-- Use new collection name
+                      replica_number=RAG_REPLICAS)
+retriever = Retriever(vector_store, embedding, "gemini_rag_collection")
 llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", google_api_key=GOOGLE_API_KEY, temperature=0.9)
+# Set once the RAG collection is loaded and warmed; /ready reports 503 until then
+rag_ready = asyncio.Event()
+
+
+async def warm_rag():
+    while True:
+        try:
+            await asyncio.to_thread(warm_up_rag, vector_store, "gemini_rag_collection")
+            rag_ready.set()
+            return
+        except Exception as e:
+            logger.warning(f"RAG warm-up failed, retrying in {WARMUP_RETRY_SECONDS}s: {e}")
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+
+
+@app.on_event("startup")
+async def start_warm_up():
+    app.state.warm_up_task = asyncio.create_task(warm_rag())
+
+
+@app.on_event("shutdown")
+async def close_retriever():
+    await retriever.close()
+
+
+@app.get("/ready")
+async def ready():
+    if not rag_ready.is_set():
+        return JSONResponse(status_code=503, content={"ready": False})
+    return {"ready": True}
 
 
 class Message(BaseModel):
@@ -53,6 +90,8 @@ class Message(BaseModel):
 class State(BaseModel):
     messages: List[Message]
     conversation_state: Optional[Dict] = {}
+    # Relevant past messages from this user, retrieved by the webhook
+    memory: Optional[List[Dict]] = []
 
 
 @app.post("/chat/")
@@ -300,12 +339,22 @@ def fetch_invoice_pdf_from_api(invoice_id: str, api_url: str,phone_number:str) -
 
 # In main.py
 
+def fetch_all_pages(path, phone_number):
+    """Every item of an fnBill list endpoint, following next_after until the last page."""
+    items, params = [], {"limit": FNBILL_PAGE_SIZE}
+    while True:
+        response = requests.get(f"{API_BASE_URL}{path}", headers={"phone-number": phone_number}, params=params)
+        response.raise_for_status()
+        page = response.json()
+        items.extend(page.get("content", []))
+        if not page.get("next_after"):
+            return items
+        params["after"] = page["next_after"]
+
 def fetch_companies(phone_number):
     logger.info("Attempting to fetch companies...")
     try:
-        response = requests.get(f"{API_BASE_URL}/companies", headers={"phone-number": phone_number})
-        response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
-        companies = response.json().get("content", [])
+        companies = fetch_all_pages("/companies", phone_number)  # Raises for bad status codes (4xx or 5xx)
         logger.info(f"Successfully fetched {len(companies)} companies.")
         return companies
     except requests.RequestException as e:
@@ -317,9 +366,7 @@ def fetch_companies(phone_number):
 def fetch_clients(phone_number):
     logger.info("Attempting to fetch clients...")
     try:
-        response = requests.get(f"{API_BASE_URL}/clients", headers={"phone-number": phone_number})
-        response.raise_for_status()
-        clients = response.json().get("content", [])
+        clients = fetch_all_pages("/clients", phone_number)
         logger.info(f"Successfully fetched {len(clients)} clients.")
         return clients
     except requests.RequestException as e:
@@ -331,9 +378,7 @@ def fetch_clients(phone_number):
 def fetch_advertisements(phone_number):
     logger.info("Attempting to fetch advertisements...")
     try:
-        response = requests.get(f"{API_BASE_URL}/advertisements", headers={"phone-number": phone_number})
-        response.raise_for_status()
-        advertisements = response.json().get("content", [])
+        advertisements = fetch_all_pages("/advertisements", phone_number)
         logger.info(f"Successfully fetched {len(advertisements)} advertisements.")
         return advertisements
     except requests.RequestException as e:
@@ -356,10 +401,7 @@ def fetch_services(company_id, phone_number):
         default_company_id = companies[0]['_id']
         print("REACHED SERVICE FETCHING")
         # Fetch services for the default company
-        response2 = requests.get(f"{API_BASE_URL}/services/company/{default_company_id}", headers={"phone-number": phone_number})
-        print(response2)
-        response2.raise_for_status()
-        services2 = response2.json().get("content", [])
+        services2 = fetch_all_pages(f"/services/company/{default_company_id}", phone_number)
         print(services2)
         for service in services2:
             service['name'] = f"{service['name']} (default)"
@@ -369,9 +411,7 @@ def fetch_services(company_id, phone_number):
             return services2
 
         # Fetch services for the selected company if it's not the default one
-        response1 = requests.get(f"{API_BASE_URL}/services/company/{company_id}", headers={"phone-number": phone_number})
-        response1.raise_for_status()
-        services1 = response1.json().get("content", [])
+        services1 = fetch_all_pages(f"/services/company/{company_id}", phone_number)
         
         all_services = services1 + services2
         logger.info(f"Successfully fetched {len(all_services)} total services.")
@@ -483,10 +523,17 @@ def add_human_touch(response):
 
 async def handle_rag(state: State,tone:str) -> dict:
     user_query = state.messages[-1].content
-    retrieved_docs = await asyncio.to_thread(
-        vector_store.similarity_search, user_query
-    )
-    context = "\n\n".join([doc.page_content for doc in retrieved_docs])    
+    if not rag_ready.is_set():
+        # Requests that arrive before the load balancer sees /ready get a short grace period
+        try:
+            await asyncio.wait_for(rag_ready.wait(), timeout=WARMUP_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning("Answering before RAG warm-up finished.")
+    retrieved = await retriever.search(user_query, route="rag")
+    context = "\n\n".join(text for text, _ in retrieved)
+    if state.memory:
+        past_messages = "\n".join(f"- {item.get('content')}" for item in state.memory if item.get("content"))
+        context += f"\n\nRelevant things this user said before:\n{past_messages}"
     tone = "Formal"
     prompt = tone_prompt(context, user_query, tone)
     response = await llm.ainvoke(prompt)
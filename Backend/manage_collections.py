@@ -0,0 +1,436 @@
+"""
+Milvus collection management for WhatsBill.
+
+Serving code binds to an alias (gemini_rag_collection, whatsapp_collection)
+that points at a versioned physical collection such as
+gemini_rag_collection_v1718000000. A rebuild creates a new version, indexes,
+fills, loads and warms it, then moves the alias in one call and drops the
+old version, so searches never hit a missing or cold collection.
+
+    python manage_collections.py list
+    python manage_collections.py create gemini_rag_collection
+    python manage_collections.py adopt whatsapp_collection     # one-off, for pre-alias deployments
+    python manage_collections.py reindex gemini_rag_collection                 # copies the stored vectors
+    python manage_collections.py reindex gemini_rag_collection --files         # re-embeds the manifest's sources
+    python manage_collections.py reindex gemini_rag_collection --files "docs/*.txt"
+    python manage_collections.py reindex whatsapp_collection
+    python manage_collections.py reindex whatsapp_collection --index-params '{"index_type": "HNSW", ...}'
+    python manage_collections.py switch gemini_rag_collection gemini_rag_collection_v1718000000
+    python manage_collections.py gc gemini_rag_collection --keep 1
+    python manage_collections.py drop some_collection
+    python manage_collections.py report --output report.json
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, MilvusException, connections, utility
+# Not re-exported from the package root by every pymilvus release
+from pymilvus.client.types import LoadState
+
+from vector_storage import VECTOR_STORAGE_MODE, index_params_for
+
+load_dotenv()
+
+NUM_PARTITIONS = int(os.getenv("MILVUS_NUM_PARTITIONS", 64))
+RAG_REPLICAS = int(os.getenv("RAG_REPLICAS", 1))
+COPY_BATCH_SIZE = 1000
+WARMUP_QUERIES = 20
+PROBE_TOP_K = (1, 10, 50)
+PROBE_QUERIES = 5
+
+
+def rag_schema():
+    fields = [
+        FieldSchema(name="pk", dtype=DataType.INT64, is_primary=True, auto_id=True),
+        FieldSchema(name="text", dtype=DataType.VARCHAR, max_length=65535),
+        FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=768),
+    ]
+    return CollectionSchema(fields, description="RAG collection with Gemini Embeddings", primary_field="pk")
+
+
+def whatsapp_schema():
+    fields = [
+        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
+        # Partition key: a per-user search only touches that user's partition
+        FieldSchema(name="from_number", dtype=DataType.VARCHAR, max_length=100, is_partition_key=True),
+        FieldSchema(name="body", dtype=DataType.VARCHAR, max_length=65535),
+        # Epoch milliseconds (UTC), so time-range filters can use a sorted index
+        FieldSchema(name="timestamp", dtype=DataType.INT64),
+        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=768),
+    ]
+    return CollectionSchema(fields, description="WhatsApp Messages with Gemini Embeddings",
+                            partition_key_field="from_number")
+
+
+# Each spec is served through an alias of the same name.
+SPECS = {
+    "gemini_rag_collection": {
+        "schema": rag_schema,
+        "vector_field": "vector",
+        "num_partitions": None,
+        "replicas": RAG_REPLICAS,
+        "scalar_indexes": [],
+    },
+    "whatsapp_collection": {
+        "schema": whatsapp_schema,
+        "vector_field": "embedding",
+        "num_partitions": NUM_PARTITIONS,
+        "replicas": 1,
+        "scalar_indexes": [
+            ("from_number", {"index_type": "INVERTED"}),
+            ("timestamp", {"index_type": "STL_SORT"}),
+        ],
+    },
+}
+
+
+def connect():
+    connections.connect(
+        alias="default",
+        host=os.getenv("MILVUS_HOST", "localhost"),
+        port=os.getenv("MILVUS_PORT", "19530")
+    )
+
+
+def versions(spec_name):
+    prefix = f"{spec_name}_v"
+    return sorted(name for name in utility.list_collections() if name.startswith(prefix))
+
+
+def alias_target(alias):
+    """The physical collection alias points at, or None."""
+    for name in utility.list_collections():
+        if alias in utility.list_aliases(name):
+            return name
+    return None
+
+
+def create_version(spec_name, collection_name=None, index_params=None):
+    spec = SPECS[spec_name]
+    collection_name = collection_name or f"{spec_name}_v{int(time.time())}"
+    kwargs = {"num_partitions": spec["num_partitions"]} if spec["num_partitions"] else {}
+    collection = Collection(name=collection_name, schema=spec["schema"](), **kwargs)
+    print(f"Collection '{collection_name}' created.")
+    create_indexes(spec_name, collection, index_params)
+    return collection
+
+
+def create_indexes(spec_name, collection, index_params=None):
+    """index_params overrides the VECTOR_STORAGE_MODE index on the vector field."""
+    spec = SPECS[spec_name]
+    existing = {index.field_name for index in collection.indexes}
+    vector_index = index_params or index_params_for(VECTOR_STORAGE_MODE)
+    wanted = [(spec["vector_field"], vector_index)] + spec["scalar_indexes"]
+    for field_name, index_params in wanted:
+        if field_name in existing:
+            print(f"Index on '{collection.name}.{field_name}' already exists.")
+            continue
+        collection.create_index(field_name=field_name, index_params=index_params,
+                                index_name=f"{field_name}_index")
+        # By name: with several indexes on the collection an unnamed wait is ambiguous
+        utility.wait_for_index_building_complete(collection.name, index_name=f"{field_name}_index")
+        print(f"{index_params['index_type']} index created on '{collection.name}.{field_name}'.")
+
+
+def search_params_for(collection, vector_field):
+    index_type = next((i.params.get("index_type") for i in collection.indexes if i.field_name == vector_field), None)
+    return {"metric_type": "L2", "params": {"ef": 64} if index_type == "HNSW" else {"nprobe": 16}}
+
+
+def load(collection, replicas=1):
+    """
+    Loads collection with `replicas` in-memory replicas. Milvus refuses to
+    change the replica count of a loaded collection; that still counts as loaded.
+    """
+    try:
+        collection.load(replica_number=replicas)
+    except MilvusException as e:
+        if utility.load_state(collection.name) != LoadState.Loaded:
+            raise
+        print(f"'{collection.name}' is already loaded; keeping its replicas ({e}).")
+    utility.wait_for_loading_complete(collection.name)
+
+
+def warm_up(collection, vector_field, queries=WARMUP_QUERIES, replicas=1):
+    """Loads the collection and runs searches with stored vectors so caches are hot."""
+    load(collection, replicas)
+    rows = collection.query(expr="", output_fields=[vector_field], limit=queries)
+    param = search_params_for(collection, vector_field)
+    for row in rows:
+        collection.search(data=[row[vector_field]], anns_field=vector_field, param=param, limit=4)
+    print(f"Warmed '{collection.name}' with {len(rows)} searches.")
+
+
+def switch_alias(alias, collection_name):
+    if alias_target(alias):
+        utility.alter_alias(collection_name, alias)
+    else:
+        utility.create_alias(collection_name, alias)
+    print(f"Alias '{alias}' now points at '{collection_name}'.")
+
+
+def gc(spec_name, keep=0):
+    """Drops versions of spec_name other than the live one and the `keep` newest before it."""
+    live = alias_target(spec_name)
+    if live is None:
+        return
+    old = [name for name in versions(spec_name) if name < live]
+    for name in old[:max(0, len(old) - keep)]:
+        utility.drop_collection(name)
+        print(f"Dropped old version '{name}'.")
+
+
+def adopt(spec_name):
+    """
+    Moves a pre-alias physical collection named spec_name to a versioned
+    name and points the alias at it. The name is unresolvable only between
+    the two calls.
+    """
+    if alias_target(spec_name):
+        print(f"'{spec_name}' is already an alias.")
+        return
+    version = f"{spec_name}_v0"
+    utility.rename_collection(spec_name, version)
+    utility.create_alias(version, spec_name)
+    print(f"Renamed '{spec_name}' to '{version}' and aliased it.")
+
+
+def copy_messages(source, target, expr):
+    """Copies whatsapp_collection rows, converting legacy ISO timestamps to epoch milliseconds."""
+    iterator = source.query_iterator(batch_size=COPY_BATCH_SIZE, expr=expr,
+                                     output_fields=["from_number", "body", "timestamp", "embedding"])
+    copied = 0
+    while True:
+        rows = iterator.next()
+        if not rows:
+            iterator.close()
+            return copied
+        for row in rows:
+            if isinstance(row["timestamp"], str):
+                parsed = datetime.fromisoformat(row["timestamp"])
+                if parsed.tzinfo is None:
+                    parsed = parsed.replace(tzinfo=timezone.utc)
+                row["timestamp"] = int(parsed.timestamp() * 1000)
+        target.insert([{key: row[key] for key in ("from_number", "body", "timestamp", "embedding")} for row in rows])
+        copied += len(rows)
+
+
+def copy_chunks(source, target):
+    """Copies gemini_rag_collection rows as stored. Returns {source pk: target pk}."""
+    iterator = source.query_iterator(batch_size=COPY_BATCH_SIZE, output_fields=["pk", "text", "vector"])
+    pks = {}
+    while True:
+        rows = iterator.next()
+        if not rows:
+            iterator.close()
+            return pks
+        result = target.insert([{"text": row["text"], "vector": row["vector"]} for row in rows])
+        pks.update(zip((row["pk"] for row in rows), result.primary_keys))
+
+
+def rebuild_rag(previous, collection, files, manifest_path):
+    """
+    Fills a new gemini_rag_collection version. Without files, the previous
+    version's vectors and text are copied and its ingest manifest is
+    remapped to the new primary keys, so an index-only change costs no
+    embedding calls. files (glob patterns; an empty list means every source
+    in the manifest) are re-embedded instead.
+    """
+    # Imported here: it prompts for an API key at import time if none is set
+    from initialize_milvus import MANIFEST_PATH, ingest, load_manifest, save_manifest
+    manifest = load_manifest(MANIFEST_PATH, previous)
+    if files is None and previous and manifest["sources"]:
+        source = Collection(name=previous)
+        load(source, SPECS["gemini_rag_collection"]["replicas"])
+        pks = copy_chunks(source, collection)
+        sources = {path: {digest: pks[pk] for digest, pk in chunks.items() if pk in pks}
+                   for path, chunks in manifest["sources"].items()}
+        save_manifest({"collection": collection.name, "sources": sources}, manifest_path)
+        print(f"Copied {len(pks)} chunks from '{previous}'.")
+        return
+
+    patterns = files or list(manifest["sources"]) or ["fnmoney.txt"]
+    paths = sorted({path for pattern in patterns for path in glob.glob(pattern)})
+    inserted, _, _ = ingest(paths, collection.name, manifest_path=manifest_path)
+    print(f"Embedded {inserted} chunks from {len(paths)} files into '{collection.name}'.")
+
+
+def reindex(spec_name, files=None, keep=0, index_params=None):
+    spec = SPECS[spec_name]
+    previous = alias_target(spec_name)
+    legacy = False
+    collection = create_version(spec_name, index_params=index_params)
+
+    if spec_name == "gemini_rag_collection":
+        from initialize_milvus import MANIFEST_PATH
+        manifest_path = f"{MANIFEST_PATH}.{collection.name}"
+        rebuild_rag(previous, collection, files, manifest_path)
+    elif previous:
+        source = Collection(name=previous)
+        source.load()
+        started_ms = int(time.time() * 1000)
+        # Timestamps may still be legacy strings; those rows all predate this run
+        legacy = any(f.name == "timestamp" and f.dtype == DataType.VARCHAR for f in source.schema.fields)
+        first_pass = "" if legacy else f"timestamp < {started_ms}"
+        print(f"Copied {copy_messages(source, collection, first_pass)} messages from '{previous}'.")
+
+    collection.flush()
+    warm_up(collection, spec["vector_field"], replicas=spec["replicas"])
+    switch_alias(spec_name, collection.name)
+
+    if spec_name == "gemini_rag_collection":
+        os.replace(manifest_path, MANIFEST_PATH)
+    elif previous and not legacy:
+        # Messages written to the old version while the first pass ran
+        late = copy_messages(source, collection, f"timestamp >= {started_ms}")
+        print(f"Copied {late} messages that arrived during the rebuild.")
+
+    gc(spec_name, keep)
+
+
+def list_collections():
+    for name in utility.list_collections():
+        aliases = utility.list_aliases(name)
+        suffix = f" (alias: {', '.join(aliases)})" if aliases else ""
+        print(f"{name}{suffix}: {Collection(name=name).num_entities} rows")
+
+
+def latency_probe(collection, vector_field, top_ks=PROBE_TOP_K, queries=PROBE_QUERIES):
+    """Times live searches with stored vectors at each top-k; milliseconds."""
+    rows = collection.query(expr="", output_fields=[vector_field], limit=queries)
+    if not rows:
+        return {}
+    param = search_params_for(collection, vector_field)
+    probe = {}
+    for k in top_ks:
+        latencies = []
+        for row in rows:
+            started = time.perf_counter()
+            collection.search(data=[row[vector_field]], anns_field=vector_field, param=param, limit=k)
+            latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        probe[f"top{k}"] = {"p50_ms": round(latencies[len(latencies) // 2], 2),
+                            "max_ms": round(latencies[-1], 2)}
+    return probe
+
+
+def collection_report(name):
+    """
+    Row and segment counts, index build progress, load state, loaded memory
+    and search latency for one collection. Many small segments mean
+    inserts are being flushed too often; compaction merges them.
+    """
+    collection = Collection(name=name)
+    load_state = utility.load_state(name)
+    loaded = load_state.name == "Loaded"
+    segments = [
+        {"id": s.segmentID, "rows": s.num_rows, "state": str(s.state)}
+        for s in utility.get_persistent_segment_info(name)
+    ]
+    summary = {
+        "name": name,
+        "aliases": utility.list_aliases(name),
+        "rows": collection.num_entities,
+        "segments": {
+            "count": len(segments),
+            "avg_rows": round(sum(s["rows"] for s in segments) / len(segments)) if segments else 0,
+            "items": segments,
+        },
+        "indexes": [],
+        "load_state": load_state.name,
+        "memory_bytes": None,
+        "latency": None,
+    }
+    for index in collection.indexes:
+        progress = utility.index_building_progress(name, index_name=index.index_name)
+        summary["indexes"].append({
+            "field": index.field_name,
+            "index_type": index.params.get("index_type"),
+            "params": index.params.get("params", {}),
+            "indexed_rows": progress.get("indexed_rows"),
+            "total_rows": progress.get("total_rows"),
+            "pending_rows": progress.get("pending_index_rows"),
+        })
+    if loaded:
+        # Only query nodes know loaded sizes, and probing an unloaded collection would fail
+        summary["memory_bytes"] = sum(s.mem_size for s in utility.get_query_segment_info(name))
+        vector_field = next((f.name for f in collection.schema.fields if f.dtype == DataType.FLOAT_VECTOR), None)
+        if vector_field:
+            summary["latency"] = latency_probe(collection, vector_field)
+    return summary
+
+
+def report(output=None):
+    reports = [collection_report(name) for name in utility.list_collections()]
+    document = json.dumps({"generated_at": datetime.now(timezone.utc).isoformat(), "collections": reports}, indent=2)
+    if output:
+        with open(output, "w") as out:
+            out.write(document)
+        print(f"Wrote report on {len(reports)} collections to {output}.")
+    else:
+        print(document)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage WhatsBill's Milvus collections.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="list collections and aliases")
+    for command in ("create", "adopt"):
+        commands.add_parser(command).add_argument("spec", choices=sorted(SPECS))
+    index = commands.add_parser("index", help="create missing indexes on a collection")
+    index.add_argument("spec", choices=sorted(SPECS))
+    index.add_argument("collection", nargs="?", help="defaults to the alias target")
+    rebuild = commands.add_parser("reindex", help="blue/green rebuild behind the alias")
+    rebuild.add_argument("spec", choices=sorted(SPECS))
+    rebuild.add_argument("--files", nargs="*",
+                         help="re-embed these files or glob patterns into gemini_rag_collection (no patterns: "
+                              "every source in the ingest manifest); without --files the stored vectors are copied")
+    rebuild.add_argument("--keep", type=int, default=0, help="old versions to keep for rollback")
+    rebuild.add_argument("--index-params", type=json.loads,
+                         help="vector index as JSON, instead of the VECTOR_STORAGE_MODE default")
+    switch = commands.add_parser("switch", help="point an alias at a version, e.g. to roll back")
+    switch.add_argument("spec", choices=sorted(SPECS))
+    switch.add_argument("collection")
+    collect = commands.add_parser("gc", help="drop versions that are no longer live")
+    collect.add_argument("spec", choices=sorted(SPECS))
+    collect.add_argument("--keep", type=int, default=0)
+    drop = commands.add_parser("drop", help="drop a physical collection")
+    drop.add_argument("collection")
+    diagnostics = commands.add_parser("report", help="JSON health and latency report for every collection")
+    diagnostics.add_argument("--output", help="write the report to this file instead of stdout")
+    args = parser.parse_args()
+
+    connect()
+    if args.command == "list":
+        list_collections()
+    elif args.command == "create":
+        collection = create_version(args.spec)
+        if not alias_target(args.spec):
+            switch_alias(args.spec, collection.name)
+    elif args.command == "adopt":
+        adopt(args.spec)
+    elif args.command == "index":
+        create_indexes(args.spec, Collection(name=args.collection or alias_target(args.spec) or args.spec))
+    elif args.command == "reindex":
+        reindex(args.spec, files=args.files, keep=args.keep, index_params=args.index_params)
+    elif args.command == "switch":
+        switch_alias(args.spec, args.collection)
+    elif args.command == "gc":
+        gc(args.spec, keep=args.keep)
+    elif args.command == "drop":
+        if alias_target(args.collection) or any(args.collection == alias_target(spec) for spec in SPECS):
+            print(f"Refusing to drop '{args.collection}': it is live behind an alias.")
+            return
+        utility.drop_collection(args.collection)
+        print(f"Collection '{args.collection}' dropped.")
+    elif args.command == "report":
+        report(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Startup warm-up for the RAG collection.
+
+A freshly started worker (or one talking to a restarted Milvus) would
+otherwise pay for collection loading and cold caches on its first
+similarity search. warm_up_rag loads the collection, checks that the
+vector field is served by a fully built index, and runs representative
+queries end to end before the server reports itself ready.
+"""
+import logging
+import os
+
+from pymilvus import Collection, DataType, utility
+
+from manage_collections import RAG_REPLICAS, load, search_params_for
+
+logger = logging.getLogger(__name__)
+
+WARMUP_QUERIES_FILE = os.getenv("RAG_WARMUP_QUERIES_FILE", "warmup_queries.txt")
+WARMUP_VECTOR_SEARCHES = int(os.getenv("RAG_WARMUP_VECTOR_SEARCHES", 20))
+WARMUP_RETRY_SECONDS = int(os.getenv("RAG_WARMUP_RETRY_SECONDS", 10))
+WARMUP_WAIT_SECONDS = float(os.getenv("RAG_WARMUP_WAIT_SECONDS", 5))
+
+
+def load_warmup_queries(path=WARMUP_QUERIES_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def check_index(collection, vector_field):
+    """Raises unless vector_field has an index covering every sealed row."""
+    index = next((i for i in collection.indexes if i.field_name == vector_field), None)
+    if index is None:
+        raise RuntimeError(f"'{collection.name}.{vector_field}' has no index; searches would scan every vector.")
+    progress = utility.index_building_progress(collection.name, index_name=index.index_name)
+    if progress.get("indexed_rows", 0) < progress.get("total_rows", 0):
+        raise RuntimeError(f"Index on '{collection.name}.{vector_field}' is still building: "
+                           f"{progress['indexed_rows']}/{progress['total_rows']} rows.")
+    return index.params.get("index_type")
+
+
+def warm_up_rag(vector_store, collection_name, replicas=RAG_REPLICAS, queries=None):
+    """
+    Blocking; run it in a thread. Raises if Milvus is unreachable or the
+    index isn't ready, so the caller can retry.
+    """
+    collection = Collection(name=collection_name)
+    vector_field = next(f.name for f in collection.schema.fields if f.dtype == DataType.FLOAT_VECTOR)
+    index_type = check_index(collection, vector_field)
+
+    # Loading is cluster-wide and idempotent, so every worker can ask for it
+    load(collection, replicas)
+
+    # Stored vectors touch the index and segment caches without embedding calls
+    param = search_params_for(collection, vector_field)
+    rows = collection.query(expr="", output_fields=[vector_field], limit=WARMUP_VECTOR_SEARCHES)
+    for row in rows:
+        collection.search(data=[row[vector_field]], anns_field=vector_field, param=param, limit=4)
+
+    # Real questions also warm the embedding client and the LangChain search path
+    queries = load_warmup_queries() if queries is None else queries
+    for query in queries:
+        vector_store.similarity_search(query)
+
+    logger.info(f"Warmed '{collection_name}' ({index_type}, {replicas} replica(s)) "
+                f"with {len(rows)} vector searches and {len(queries)} queries.")
@@ -0,0 +1,63 @@
+"""
+Recall-regression check for a compressed vector storage mode.
+
+Builds the mode's index on a scratch copy of sampled vectors and compares
+its recall@k with exact full-precision search. Exits non-zero when recall
+falls below --min-recall, so it can gate a switch of VECTOR_STORAGE_MODE.
+
+    python recall_check.py --collection gemini_rag_collection --field vector --mode sq8
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+from pymilvus import Collection, connections, utility
+
+from index_benchmark import benchmark_candidate, build_scratch_collection, exact_neighbours, sample_vectors
+from vector_storage import STORAGE_MODES, bytes_per_vector
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a storage mode's recall with full-precision search.")
+    parser.add_argument("--collection", default="gemini_rag_collection")
+    parser.add_argument("--field", default="vector")
+    parser.add_argument("--mode", choices=sorted(STORAGE_MODES), default="sq8")
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--sample", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    args = parser.parse_args()
+
+    connections.connect(host=os.getenv("MILVUS_HOST", "localhost"), port=os.getenv("MILVUS_PORT", "19530"))
+    collection = Collection(name=args.collection)
+    collection.load()
+
+    vectors = sample_vectors(collection, args.field, args.sample + args.queries)
+    if len(vectors) <= args.queries:
+        sys.exit(f"Collection '{args.collection}' has only {len(vectors)} vectors; need more than {args.queries}.")
+    np.random.default_rng(0).shuffle(vectors)
+    queries, base = vectors[:args.queries], vectors[args.queries:]
+    k = min(args.k, len(base))
+    truth = exact_neighbours(base, queries, k)
+
+    scratch_name = f"{args.collection}_recall_check"
+    scratch = build_scratch_collection(scratch_name, base)
+    candidate = {**STORAGE_MODES[args.mode], "search": [{"nprobe": args.nprobe}]}
+    try:
+        result = benchmark_candidate(scratch, candidate, queries, truth, k)[0]
+    finally:
+        utility.drop_collection(scratch_name)
+
+    dim = base.shape[1]
+    recall = result[f"recall@{k}"]
+    ratio = bytes_per_vector("float32", dim) / bytes_per_vector(args.mode, dim)
+    print(f"{args.mode}: recall@{k}={recall} vs exact, p99={result['p99_ms']} ms, "
+          f"{bytes_per_vector(args.mode, dim)} bytes/vector ({ratio:.0f}x smaller than float32)")
+    if recall < args.min_recall:
+        sys.exit(f"Recall regression: {recall} < {args.min_recall}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Retrieval settings for the chat backend's Milvus searches.
+
+Every knob is per route and read from the environment, e.g. for the "rag"
+route: RETRIEVAL_RAG_K, RETRIEVAL_RAG_NPROBE, RETRIEVAL_RAG_EF and
+RETRIEVAL_RAG_MAX_DISTANCE. RETRIEVAL_CONSISTENCY_LEVEL applies to all
+searches. gemini_rag_collection only changes on re-ingestion, so "Bounded"
+(or "Eventually") avoids each search waiting for the newest write
+timestamp the way "Strong" does.
+
+retrieval_benchmark.py measures what these settings cost on a deployment.
+"""
+import asyncio
+import os
+import time
+
+from pymilvus import AsyncMilvusClient, Collection, DataType
+
+CONSISTENCY_LEVELS = ("Strong", "Bounded", "Session", "Eventually")
+CONSISTENCY_LEVEL = os.getenv("RETRIEVAL_CONSISTENCY_LEVEL", "Bounded")
+# Search through pymilvus' asyncio client instead of a thread per search
+USE_ASYNC_CLIENT = os.getenv("RETRIEVAL_ASYNC_CLIENT", "false").lower() == "true"
+# How often the index type behind the alias is re-read, so a reindex that
+# switches to a version with another index type gets matching search params
+INDEX_REFRESH_SECONDS = float(os.getenv("RETRIEVAL_INDEX_REFRESH_SECONDS", 10))
+
+DEFAULTS = {"k": 4, "nprobe": 16, "ef": 64, "max_distance": None}
+
+
+def route_config(route):
+    """Settings for one route, e.g. RETRIEVAL_RAG_K=6 sets k for route "rag"."""
+    config = {}
+    for key, default in DEFAULTS.items():
+        value = os.getenv(f"RETRIEVAL_{route.upper()}_{key.upper()}")
+        if value is None or value == "":
+            config[key] = default
+        else:
+            config[key] = float(value) if key == "max_distance" else int(value)
+    return config
+
+
+class Retriever:
+    """
+    Searches one collection with per-route k, nprobe/ef and an L2 distance
+    cut-off, returning [(text, distance)] nearest first.
+    """
+
+    def __init__(self, vector_store, embedding, collection_name, consistency_level=CONSISTENCY_LEVEL,
+                 use_async_client=USE_ASYNC_CLIENT):
+        if consistency_level not in CONSISTENCY_LEVELS:
+            raise ValueError(f"Unknown consistency level '{consistency_level}'. "
+                             f"Use one of {', '.join(CONSISTENCY_LEVELS)}.")
+        self.vector_store = vector_store
+        self.embedding = embedding
+        self.collection_name = collection_name
+        self.consistency_level = consistency_level
+        self.use_async_client = use_async_client
+        self.routes = {}
+        self._index = None
+        self._index_read_at = 0.0
+        self._client = None
+
+    def _index_stale(self):
+        return self._index is None or time.monotonic() - self._index_read_at >= INDEX_REFRESH_SECONDS
+
+    def _index_info(self):
+        """(vector field, index type), re-read every INDEX_REFRESH_SECONDS."""
+        if self._index_stale():
+            collection = Collection(name=self.collection_name)
+            vector_field = next(f.name for f in collection.schema.fields if f.dtype == DataType.FLOAT_VECTOR)
+            index_type = next((i.params.get("index_type") for i in collection.indexes
+                               if i.field_name == vector_field), None)
+            self._index = (vector_field, index_type)
+            self._index_read_at = time.monotonic()
+        return self._index
+
+    def search_param(self, route):
+        config = self.routes.setdefault(route, route_config(route))
+        _, index_type = self._index_info()
+        params = {"ef": max(config["ef"], config["k"])} if index_type == "HNSW" else {"nprobe": config["nprobe"]}
+        if config["max_distance"] is not None:
+            # Range search: Milvus drops hits beyond the radius instead of returning them
+            params["radius"] = config["max_distance"]
+        return {"metric_type": "L2", "params": params}, config
+
+    def _search_sync(self, query, route):
+        param, config = self.search_param(route)
+        results = self.vector_store.similarity_search_with_score(
+            query, k=config["k"], param=param, consistency_level=self.consistency_level)
+        return [(doc.page_content, score) for doc, score in results]
+
+    async def _search_async(self, query, route):
+        if self._index_stale():
+            # The lookup is a blocking RPC; keep it off the event loop
+            await asyncio.to_thread(self._index_info)
+        param, config = self.search_param(route)
+        vector_field, _ = self._index_info()
+        vector = await self.embedding.aembed_query(query)
+        if self._client is None:
+            # Created lazily so it binds to the serving event loop
+            self._client = AsyncMilvusClient(
+                uri=f"http://{os.getenv('MILVUS_HOST', 'localhost')}:{os.getenv('MILVUS_PORT', '19530')}")
+        hits = await self._client.search(
+            self.collection_name, data=[vector], anns_field=vector_field, limit=config["k"],
+            search_params=param, output_fields=["text"], consistency_level=self.consistency_level)
+        return [(hit["entity"]["text"], hit["distance"]) for hit in hits[0]]
+
+    async def search(self, query, route="rag"):
+        if self.use_async_client:
+            results = await self._search_async(query, route)
+        else:
+            results = await asyncio.to_thread(self._search_sync, query, route)
+        max_distance = self.routes[route]["max_distance"]
+        if max_distance is not None:
+            results = [(text, distance) for text, distance in results if distance <= max_distance]
+        return results
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
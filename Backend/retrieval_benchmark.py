@@ -0,0 +1,104 @@
+"""
+Measures how retrieval settings affect search latency on a live collection.
+
+Replays stored vectors as queries (no embedding calls, so only Milvus time
+is measured) for every consistency level, with both the thread-per-search
+path and pymilvus' asyncio client, at the given concurrency and top-k
+values. Numbers depend on the deployment and on write traffic: Strong
+consistency only costs extra while the collection is receiving writes.
+
+    python retrieval_benchmark.py --collection gemini_rag_collection --concurrency 8 --json retrieval.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from dotenv import load_dotenv
+from pymilvus import AsyncMilvusClient, Collection, connections
+
+from manage_collections import search_params_for
+from retrieval import CONSISTENCY_LEVELS
+
+load_dotenv()
+
+
+def summarize(latencies, wall_seconds):
+    latencies = sorted(latencies)
+    return {
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2),
+        "qps": round(len(latencies) / wall_seconds, 1),
+    }
+
+
+async def timed_searches(search, vectors, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(vector):
+        async with semaphore:
+            started = time.perf_counter()
+            await search(vector)
+            return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(one(vector) for vector in vectors))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def run(args):
+    connections.connect(host=os.getenv("MILVUS_HOST", "localhost"), port=os.getenv("MILVUS_PORT", "19530"))
+    collection = Collection(name=args.collection)
+    collection.load()
+    rows = collection.query(expr="", output_fields=[args.field], limit=args.queries)
+    if not rows:
+        print(f"Collection '{args.collection}' is empty.")
+        return []
+    vectors = [row[args.field] for row in rows] * args.repeat
+    param = search_params_for(collection, args.field)
+    client = AsyncMilvusClient(uri=f"http://{os.getenv('MILVUS_HOST', 'localhost')}:{os.getenv('MILVUS_PORT', '19530')}")
+
+    results = []
+    try:
+        for k in args.k:
+            for level in CONSISTENCY_LEVELS:
+                def threaded(vector, k=k, level=level):
+                    return asyncio.to_thread(collection.search, data=[vector], anns_field=args.field, param=param,
+                                             limit=k, consistency_level=level)
+
+                def native(vector, k=k, level=level):
+                    return client.search(args.collection, data=[vector], anns_field=args.field, limit=k,
+                                         search_params=param, consistency_level=level)
+
+                for client_name, search in (("to_thread", threaded), ("async", native)):
+                    # One untimed pass so connection setup doesn't land in the first configuration
+                    await search(vectors[0])
+                    summary = await timed_searches(search, vectors, args.concurrency)
+                    results.append({"k": k, "consistency": level, "client": client_name, **summary})
+                    print(f"k={k:<3} {level:<10} {client_name:<9} p50={summary['p50_ms']:>7} ms  "
+                          f"p99={summary['p99_ms']:>7} ms  {summary['qps']:>8} qps")
+    finally:
+        await client.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval consistency levels and search clients.")
+    parser.add_argument("--collection", default="gemini_rag_collection")
+    parser.add_argument("--field", default="vector")
+    parser.add_argument("--queries", type=int, default=50, help="stored vectors to replay")
+    parser.add_argument("--repeat", type=int, default=4, help="times each vector is replayed")
+    parser.add_argument("--concurrency", type=int, default=8, help="searches in flight")
+    parser.add_argument("--k", type=int, nargs="+", default=[4, 10])
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(results, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# The backend's modules are flat scripts run from their own directory
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+class FakeCollection:
+    """The parts of pymilvus.Collection the collection tools use, in memory."""
+
+    def __init__(self, name, indexes=(), rows=(), first_pk=1):
+        self.name = name
+        self.indexes = [SimpleNamespace(field_name=field, index_name=f"{field}_index", params=params)
+                        for field, params in indexes]
+        self.rows = list(rows)
+        self.next_pk = first_pk
+        self.loaded = False
+
+    def create_index(self, field_name, index_params, index_name):
+        self.indexes.append(SimpleNamespace(field_name=field_name, index_name=index_name, params=index_params))
+
+    def drop_index(self, index_name):
+        self.indexes = [index for index in self.indexes if index.index_name != index_name]
+
+    def insert(self, rows):
+        pks = list(range(self.next_pk, self.next_pk + len(rows)))
+        self.next_pk += len(rows)
+        self.rows += [{"pk": pk, **row} for pk, row in zip(pks, rows)]
+        return SimpleNamespace(primary_keys=pks)
+
+    def query_iterator(self, batch_size, output_fields, expr=""):
+        batches = [self.rows[i:i + batch_size] for i in range(0, len(self.rows), batch_size)]
+        return SimpleNamespace(next=lambda: batches.pop(0) if batches else [], close=lambda: None)
+
+    def load(self, **kwargs):
+        self.loaded = True
+
+    def release(self):
+        self.loaded = False
+
+
+class FakeUtility:
+    """pymilvus.utility against a dict of collections and their aliases."""
+
+    def __init__(self):
+        self.aliases = {}
+        self.collections = {}
+        self.index_waits = []
+
+    def add(self, collection, *aliases):
+        self.collections[collection.name] = collection
+        self.aliases[collection.name] = list(aliases)
+        return collection
+
+    def list_collections(self):
+        return list(self.collections)
+
+    def list_aliases(self, name):
+        return self.aliases.get(name, [])
+
+    def wait_for_index_building_complete(self, collection_name, index_name=""):
+        indexes = self.collections[collection_name].indexes
+        if not index_name and len(indexes) > 1:
+            raise AssertionError(f"AmbiguousIndexName: '{collection_name}' has {len(indexes)} indexes")
+        self.index_waits.append((collection_name, index_name))
+
+
+@pytest.fixture
+def make_collection():
+    return FakeCollection
+
+
+@pytest.fixture
+def milvus(monkeypatch):
+    import index_benchmark
+    import manage_collections
+    utility = FakeUtility()
+    monkeypatch.setattr(manage_collections, "utility", utility)
+    monkeypatch.setattr(index_benchmark, "utility", utility)
+    return utility
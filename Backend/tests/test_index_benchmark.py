@@ -0,0 +1,62 @@
+import pytest
+
+import index_benchmark
+from index_benchmark import apply_index, pareto_front, pick_best
+
+
+def result(name, recall, p99_ms, memory_mb, qps):
+    return {"name": name, "recall@10": recall, "p99_ms": p99_ms, "memory_mb": memory_mb, "qps": qps,
+            "index_type": "HNSW", "build_params": {"M": 16, "efConstruction": 200}}
+
+
+@pytest.fixture
+def results():
+    return [
+        result("flat", 1.0, 20.0, 300, 50),
+        result("hnsw", 0.98, 2.0, 400, 900),
+        result("ivf", 0.95, 3.0, 310, 600),
+        # Worse than hnsw on everything
+        result("dominated", 0.97, 4.0, 450, 1000),
+    ]
+
+
+def test_pareto_front_drops_dominated_configurations(results):
+    assert [r["name"] for r in pareto_front(results, 10)] == ["flat", "hnsw", "ivf"]
+
+
+def test_pick_best_is_the_fastest_eligible_configuration(results):
+    assert pick_best(results, 10, 0.9)["name"] == "hnsw"
+    assert pick_best(results, 10, 0.99)["name"] == "flat"
+    assert pick_best(results, 10, 1.01) is None
+
+
+def test_in_place_rebuild_names_and_waits_for_the_new_index(milvus, make_collection, results):
+    collection = milvus.add(make_collection("scratch", indexes=[("vector", {"index_type": "FLAT"}),
+                                                                ("category", {"index_type": "INVERTED"})]))
+    assert apply_index(collection, "vector", results[1])
+    vector_index = next(index for index in collection.indexes if index.field_name == "vector")
+    assert vector_index.index_name == "vector_index"
+    assert vector_index.params == {"index_type": "HNSW", "metric_type": "L2",
+                                   "params": {"M": 16, "efConstruction": 200}}
+    assert [index.field_name for index in collection.indexes] == ["category", "vector"]
+    assert milvus.index_waits == [("scratch", "vector_index")]
+    assert collection.loaded
+
+
+def test_aliased_spec_collection_is_reindexed_behind_its_alias(monkeypatch, milvus, make_collection, results):
+    reindexed = []
+    monkeypatch.setattr(index_benchmark, "reindex", lambda *args, **kwargs: reindexed.append((args, kwargs)))
+    milvus.add(make_collection("gemini_rag_collection_v1"), "gemini_rag_collection")
+    # The alias resolves to the collection, whose name is the alias
+    collection = make_collection("gemini_rag_collection")
+    assert apply_index(collection, "vector", results[1])
+    assert reindexed == [(("gemini_rag_collection",), {
+        "files": None, "keep": 1,
+        "index_params": {"index_type": "HNSW", "metric_type": "L2", "params": {"M": 16, "efConstruction": 200}},
+    })]
+
+
+def test_other_live_collections_are_not_rebuilt_in_place(milvus, make_collection, results):
+    collection = milvus.add(make_collection("reports_v1", indexes=[("vector", {"index_type": "FLAT"})]), "reports")
+    assert not apply_index(collection, "vector", results[1])
+    assert collection.indexes[0].params == {"index_type": "FLAT"}
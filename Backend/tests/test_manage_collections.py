@@ -0,0 +1,140 @@
+import json
+import os
+import sys
+from types import ModuleType
+
+import pytest
+from pymilvus import MilvusException
+from pymilvus.client.types import LoadState
+
+import manage_collections
+from manage_collections import SPECS, create_indexes, load, rebuild_rag
+
+
+@pytest.fixture
+def ingest_module(monkeypatch, tmp_path):
+    """
+    Stands in for initialize_milvus, which needs the embedding stack; keeps
+    its manifest format and records what would have been embedded.
+    """
+    module = ModuleType("initialize_milvus")
+    module.MANIFEST_PATH = str(tmp_path / "ingest_manifest.json")
+    module.ingested = []
+
+    def load_manifest(path, collection_name):
+        if os.path.exists(path):
+            with open(path) as file:
+                manifest = json.load(file)
+            if manifest.get("collection") == collection_name:
+                return manifest
+        return {"collection": collection_name, "sources": {}}
+
+    def save_manifest(manifest, path):
+        with open(path, "w") as file:
+            json.dump(manifest, file)
+
+    def ingest(paths, collection_name, manifest_path):
+        module.ingested.append((paths, collection_name, manifest_path))
+        return len(paths), 0, 0
+
+    module.load_manifest, module.save_manifest, module.ingest = load_manifest, save_manifest, ingest
+    monkeypatch.setitem(sys.modules, "initialize_milvus", module)
+    return module
+
+
+def write_manifest(path, manifest):
+    with open(path, "w") as file:
+        json.dump(manifest, file)
+
+
+def test_create_indexes_waits_for_each_index_by_name(milvus, make_collection):
+    collection = milvus.add(make_collection("whatsapp_collection_v1"))
+    create_indexes("whatsapp_collection", collection)
+    assert [index.index_name for index in collection.indexes] == ["embedding_index", "from_number_index",
+                                                                  "timestamp_index"]
+    assert milvus.index_waits == [("whatsapp_collection_v1", name) for name in
+                                  ("embedding_index", "from_number_index", "timestamp_index")]
+
+
+def test_create_indexes_skips_existing_ones(milvus, make_collection):
+    collection = milvus.add(make_collection("whatsapp_collection_v1",
+                                            indexes=[("embedding", {"index_type": "HNSW"})]))
+    create_indexes("whatsapp_collection", collection)
+    assert collection.indexes[0].params == {"index_type": "HNSW"}
+    assert [wait[1] for wait in milvus.index_waits] == ["from_number_index", "timestamp_index"]
+
+
+def test_create_indexes_uses_the_given_vector_index(milvus, make_collection):
+    collection = milvus.add(make_collection("gemini_rag_collection_v1"))
+    params = {"index_type": "IVF_SQ8", "metric_type": "L2", "params": {"nlist": 128}}
+    create_indexes("gemini_rag_collection", collection, params)
+    assert collection.indexes[0].params == params
+
+
+def test_index_only_rebuild_copies_vectors_and_remaps_the_manifest(monkeypatch, make_collection, ingest_module,
+                                                                   tmp_path):
+    previous = make_collection("gemini_rag_collection_v1", rows=[
+        {"pk": 1, "text": "a", "vector": [0.1]},
+        {"pk": 2, "text": "b", "vector": [0.2]},
+    ])
+    target = make_collection("gemini_rag_collection_v2", first_pk=101)
+    monkeypatch.setattr(manage_collections, "Collection", lambda name: previous)
+    monkeypatch.setattr(manage_collections, "load", lambda collection, replicas=1: None)
+    write_manifest(ingest_module.MANIFEST_PATH,
+                   {"collection": previous.name, "sources": {"fnmoney.txt": {"h1": 1, "h2": 2}}})
+    manifest_path = str(tmp_path / "next.json")
+
+    rebuild_rag(previous.name, target, None, manifest_path)
+
+    assert [(row["text"], row["vector"]) for row in target.rows] == [("a", [0.1]), ("b", [0.2])]
+    with open(manifest_path) as file:
+        assert json.load(file) == {"collection": target.name, "sources": {"fnmoney.txt": {"h1": 101, "h2": 102}}}
+    assert ingest_module.ingested == []
+
+
+def test_empty_files_reembed_every_manifest_source(monkeypatch, make_collection, ingest_module, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    for name in ("fnmoney.txt", "faq.txt"):
+        (tmp_path / name).write_text("text")
+    write_manifest(ingest_module.MANIFEST_PATH,
+                   {"collection": "gemini_rag_collection_v1", "sources": {"fnmoney.txt": {}, "faq.txt": {}}})
+    target = make_collection("gemini_rag_collection_v2")
+
+    rebuild_rag("gemini_rag_collection_v1", target, [], "next.json")
+
+    assert ingest_module.ingested == [(["faq.txt", "fnmoney.txt"], target.name, "next.json")]
+
+
+def test_file_patterns_are_expanded(monkeypatch, make_collection, ingest_module, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "docs").mkdir()
+    for name in ("b.txt", "a.txt", "notes.md"):
+        (tmp_path / "docs" / name).write_text("text")
+    target = make_collection("gemini_rag_collection_v2")
+
+    rebuild_rag(None, target, ["docs/*.txt", "docs/a.txt"], "next.json")
+
+    assert ingest_module.ingested[0][0] == ["docs/a.txt", "docs/b.txt"]
+
+
+def test_first_build_embeds_the_default_corpus(monkeypatch, make_collection, ingest_module, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "fnmoney.txt").write_text("text")
+    rebuild_rag(None, make_collection("gemini_rag_collection_v1"), None, "next.json")
+    assert ingest_module.ingested[0][0] == ["fnmoney.txt"]
+
+
+def test_load_accepts_an_already_loaded_collection(monkeypatch, milvus, make_collection):
+    collection = milvus.add(make_collection("gemini_rag_collection_v1"))
+
+    def refuse(**kwargs):
+        raise MilvusException(message="can't change the replica number for loaded collection")
+
+    collection.load = refuse
+    milvus.load_state = lambda name: LoadState.Loaded
+    milvus.wait_for_loading_complete = lambda name: None
+    load(collection, SPECS["gemini_rag_collection"]["replicas"] + 1)
+
+    milvus.load_state = lambda name: LoadState.NotLoad
+    with pytest.raises(MilvusException):
+        load(collection, 2)
@@ -0,0 +1,87 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from pymilvus import DataType
+
+import retrieval
+from retrieval import Retriever, route_config
+
+
+class FakeVectorStore:
+    def __init__(self, hits):
+        self.hits = hits
+        self.calls = []
+
+    def similarity_search_with_score(self, query, k, param, consistency_level):
+        self.calls.append({"k": k, "param": param, "consistency_level": consistency_level})
+        return [(SimpleNamespace(page_content=text), distance) for text, distance in self.hits[:k]]
+
+
+@pytest.fixture
+def index(monkeypatch):
+    """The live collection's vector index; set index.type to switch it."""
+    state = SimpleNamespace(type="IVF_FLAT", reads=0)
+
+    def collection(name):
+        state.reads += 1
+        return SimpleNamespace(
+            schema=SimpleNamespace(fields=[SimpleNamespace(name="pk", dtype=DataType.INT64),
+                                           SimpleNamespace(name="vector", dtype=DataType.FLOAT_VECTOR)]),
+            indexes=[SimpleNamespace(field_name="vector", params={"index_type": state.type})],
+        )
+
+    monkeypatch.setattr(retrieval, "Collection", collection)
+    return state
+
+
+def test_route_config_reads_the_environment(monkeypatch):
+    monkeypatch.setenv("RETRIEVAL_FAQ_K", "8")
+    monkeypatch.setenv("RETRIEVAL_FAQ_MAX_DISTANCE", "0.5")
+    monkeypatch.setenv("RETRIEVAL_FAQ_NPROBE", "")
+    assert route_config("faq") == {"k": 8, "nprobe": 16, "ef": 64, "max_distance": 0.5}
+
+
+def test_unknown_consistency_level_is_refused():
+    with pytest.raises(ValueError):
+        Retriever(None, None, "gemini_rag_collection", consistency_level="Sometimes")
+
+
+def test_ivf_search_uses_nprobe(index):
+    param, config = Retriever(None, None, "gemini_rag_collection").search_param("rag")
+    assert param == {"metric_type": "L2", "params": {"nprobe": 16}}
+    assert config["k"] == 4
+
+
+def test_hnsw_ef_is_never_below_k(index, monkeypatch):
+    index.type = "HNSW"
+    monkeypatch.setenv("RETRIEVAL_RAG_K", "100")
+    param, _ = Retriever(None, None, "gemini_rag_collection").search_param("rag")
+    assert param["params"] == {"ef": 100}
+
+
+def test_max_distance_becomes_a_range_search(index, monkeypatch):
+    monkeypatch.setenv("RETRIEVAL_RAG_MAX_DISTANCE", "0.4")
+    param, _ = Retriever(None, None, "gemini_rag_collection").search_param("rag")
+    assert param["params"] == {"nprobe": 16, "radius": 0.4}
+
+
+def test_index_type_is_reread_after_a_reindex(index, monkeypatch):
+    retriever = Retriever(None, None, "gemini_rag_collection")
+    retriever.search_param("rag")
+    index.type = "HNSW"
+    assert "nprobe" in retriever.search_param("rag")[0]["params"]
+    assert index.reads == 1
+
+    monkeypatch.setattr(retrieval, "INDEX_REFRESH_SECONDS", 0)
+    assert "ef" in retriever.search_param("rag")[0]["params"]
+    assert index.reads == 2
+
+
+def test_search_drops_hits_beyond_max_distance(index, monkeypatch):
+    monkeypatch.setenv("RETRIEVAL_RAG_MAX_DISTANCE", "0.5")
+    store = FakeVectorStore([("near", 0.1), ("edge", 0.5), ("far", 0.9)])
+    retriever = Retriever(store, None, "gemini_rag_collection", consistency_level="Eventually")
+    assert asyncio.run(retriever.search("invoice?")) == [("near", 0.1), ("edge", 0.5)]
+    assert store.calls[0]["k"] == 4
+    assert store.calls[0]["consistency_level"] == "Eventually"
@@ -0,0 +1,31 @@
+import os
+
+# How vectors are held in memory once a collection is loaded. The raw
+# FLOAT_VECTOR column stays on disk; only the index is loaded for search, so
+# the index type sets the per-vector memory cost (768 dims shown):
+#   float32: IVF_FLAT, full-precision copy          3072 bytes
+#   sq8:     IVF_SQ8, one byte per dimension          768 bytes (4x smaller)
+#   pq:      IVF_PQ, 384 sub-vectors x 8-bit codes    384 bytes (8x smaller)
+# All three are IVF indexes searched with "nprobe", so query code is
+# unchanged whichever mode a collection was built with.
+VECTOR_STORAGE_MODE = os.getenv("VECTOR_STORAGE_MODE", "float32")
+
+STORAGE_MODES = {
+    "float32": {"index_type": "IVF_FLAT", "params": {"nlist": 128}},
+    "sq8": {"index_type": "IVF_SQ8", "params": {"nlist": 128}},
+    "pq": {"index_type": "IVF_PQ", "params": {"nlist": 128, "m": 384, "nbits": 8}},
+}
+
+
+def index_params_for(mode=VECTOR_STORAGE_MODE, metric_type="L2"):
+    if mode not in STORAGE_MODES:
+        raise ValueError(f"Unknown VECTOR_STORAGE_MODE '{mode}'. Use one of {', '.join(STORAGE_MODES)}.")
+    return {"metric_type": metric_type, **STORAGE_MODES[mode]}
+
+
+def bytes_per_vector(mode, dim=768):
+    if mode == "sq8":
+        return dim
+    if mode == "pq":
+        return STORAGE_MODES["pq"]["params"]["m"]
+    return dim * 4
@@ -0,0 +1,80 @@
+# bench_serialization.py
+#
+# Microbenchmark for the list endpoints' JSON encoding on a synthetic
+# catalog of client documents as they come out of pymongo.
+#
+#     python bench_serialization.py --docs 10000
+
+import argparse
+import json
+import time
+from typing import Dict, List
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from models import Client
+from pagination import to_jsonable
+from serialization import dumps
+
+
+def make_clients(count):
+    return [
+        {
+            "_id": ObjectId(),
+            "name": f"Client {i}",
+            "address_list": [
+                {"street_address": f"{i} Main Street", "city": "Pune", "state": "Maharashtra", "zip": "411001"},
+                {"street_address": f"{i} Station Road", "city": "Mumbai", "state": "Maharashtra", "zip": "400001"},
+            ],
+        }
+        for i in range(count)
+    ]
+
+
+def pydantic_response_model(docs, adapter=TypeAdapter(Dict[str, List[Client]])):
+    # What response_model=Dict[str, List[Client]] did: validate, dump by alias, json.dumps
+    validated = adapter.validate_python({"content": docs})
+    return json.dumps(adapter.dump_python(validated, mode="json", by_alias=True)).encode()
+
+
+def jsonable_encoder_path(docs):
+    # A plain dict return: FastAPI's jsonable_encoder walk, then json.dumps
+    return json.dumps(jsonable_encoder({"content": [to_jsonable(doc) for doc in docs]})).encode()
+
+
+def orjson_path(docs):
+    return dumps({"content": docs})
+
+
+def best_of(fn, docs, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(docs)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare list endpoint serialization paths.")
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    docs = make_clients(args.docs)
+    # Every path must produce the same JSON
+    expected = json.loads(orjson_path(docs))
+    paths = [("pydantic response_model", pydantic_response_model), ("jsonable_encoder", jsonable_encoder_path),
+             ("orjson", orjson_path)]
+    for name, fn in paths:
+        assert json.loads(fn(docs)) == expected, name
+
+    baseline = best_of(pydantic_response_model, docs, args.repeat)
+    print(f"{args.docs} documents, best of {args.repeat}:")
+    for name, fn in paths:
+        seconds = best_of(fn, docs, args.repeat)
+        print(f"  {name:<24} {seconds * 1000:8.1f} ms  {baseline / seconds:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# catalog.py
+
+import asyncio
+import logging
+import os
+import time
+from typing import Optional, Type
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from pymongo.errors import PyMongoError
+from pydantic import BaseModel
+from pagination import STREAM_BATCH_SIZE, is_inclusion, iter_ndjson, parse_object_id, parse_projection
+from serialization import json_response
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on staleness when change streams are unavailable (standalone mongod)
+DEFAULT_COMPANY_TTL_SECONDS = int(os.getenv("DEFAULT_COMPANY_TTL_SECONDS", 300))
+
+
+class DefaultCompanyResolver:
+    """
+    Caches each tenant's "default" company id (its first company).
+    watch() clears the cache whenever the companies collection changes.
+    """
+
+    def __init__(self, db, ttl_seconds=DEFAULT_COMPANY_TTL_SECONDS):
+        self.db = db
+        self.ttl_seconds = ttl_seconds
+        self._companies = {}
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._companies = {}
+
+    def _cached(self, tenant_id):
+        entry = self._companies.get(tenant_id)
+        return entry if entry is not None and time.monotonic() < entry[1] else None
+
+    async def get(self, tenant_id: ObjectId) -> Optional[ObjectId]:
+        entry = self._cached(tenant_id)
+        if entry is None:
+            async with self._lock:
+                # Another request may have refreshed it while we waited
+                entry = self._cached(tenant_id)
+                if entry is None:
+                    company = await self.db.companies.find_one({"tenant_id": tenant_id}, {"_id": 1},
+                                                               sort=[("_id", 1)])
+                    entry = (company["_id"] if company else None, time.monotonic() + self.ttl_seconds)
+                    self._companies[tenant_id] = entry
+        return entry[0]
+
+    async def watch(self):
+        """Runs until cancelled; falls back to the TTL alone without a replica set."""
+        try:
+            async with await self.db.companies.watch() as stream:
+                async for _ in stream:
+                    self.invalidate()
+        except PyMongoError as e:
+            logger.warning(f"Companies change stream unavailable, default company cached for "
+                           f"{self.ttl_seconds}s: {e}")
+
+
+def parse_service_cursor(after: Optional[str]):
+    """next_after for services is '<rank>:<id>', rank 0 for the requested company and 1 for the default."""
+    rank, _, service_id = (after or "").partition(":")
+    if rank not in ("0", "1"):
+        raise HTTPException(status_code=400, detail=f"Invalid after: {after}")
+    return int(rank), parse_object_id(service_id, "after")
+
+
+def service_branch(tenant_id: ObjectId, company_id: ObjectId, rank: int, after_id: Optional[ObjectId] = None,
+                   limit: Optional[int] = None):
+    """One company's services in _id order: a range scan on the (tenant_id, company_id, _id) index."""
+    match = {"tenant_id": tenant_id, "company_id": company_id}
+    if after_id is not None:
+        match["_id"] = {"$gt": after_id}
+    stages = [{"$match": match}, {"$sort": {"_id": 1}}]
+    if limit is not None:
+        stages.append({"$limit": limit})
+    return stages + [{"$addFields": {"_rank": rank}}]
+
+
+def services_filter(tenant_id: ObjectId, company_id: ObjectId, default_company_id: Optional[ObjectId]):
+    company_ids = [company_id]
+    if default_company_id is not None and default_company_id != company_id:
+        company_ids.append(default_company_id)
+    return {"tenant_id": tenant_id, "company_id": {"$in": company_ids}}
+
+
+def services_pipeline(tenant_id: ObjectId, company_id: ObjectId, default_company_id: Optional[ObjectId],
+                      after: Optional[str] = None, limit: Optional[int] = None):
+    """
+    The requested company's services, then the default company's, each in
+    _id (insertion) order, matching the old two-query concatenation. Each
+    company is its own index-backed branch that starts after the cursor and
+    stops at limit; $unionWith appends the default company's branch.
+    """
+    rank, after_id = parse_service_cursor(after) if after else (0, None)
+    branches = []
+    if rank == 0:
+        branches.append(service_branch(tenant_id, company_id, 0, after_id, limit))
+    if default_company_id is not None and default_company_id != company_id:
+        branches.append(service_branch(tenant_id, default_company_id, 1, after_id if rank == 1 else None, limit))
+    if not branches:
+        # Past the requested company and there is no default company (any more)
+        return [{"$match": {"_id": {"$in": []}}}]
+    pipeline = branches[0]
+    if len(branches) > 1:
+        pipeline = pipeline + [{"$unionWith": {"coll": "services", "pipeline": branches[1]}}]
+    return pipeline
+
+
+def output_stage(fields: Optional[str], keep_rank=False):
+    projection = parse_projection(fields)
+    if is_inclusion(projection):
+        # An inclusion projection drops _rank unless asked for
+        return [{"$project": {**projection, "_rank": 1} if keep_rank else projection}]
+    return [{"$project": projection if keep_rank else {**projection, "_rank": 0}}]
+
+
+def services_page_pipeline(tenant_id: ObjectId, company_id: ObjectId, default_company_id: Optional[ObjectId],
+                           limit: int, after: Optional[str], fields: Optional[str]):
+    """
+    One page (limit + 1 documents, to detect a next page) followed by a
+    {"_total": n} document, so the page and its total take one round trip.
+    """
+    # Each branch returns at most limit + 1 documents, so this sort is bounded
+    page = services_pipeline(tenant_id, company_id, default_company_id, after, limit + 1) + [
+        {"$sort": {"_rank": 1, "_id": 1}},
+        {"$limit": limit + 1},
+    ] + output_stage(fields, keep_rank=True)
+    total = [{"$match": services_filter(tenant_id, company_id, default_company_id)}, {"$count": "_total"}]
+    return page + [{"$unionWith": {"coll": "services", "pipeline": total}}]
+
+
+async def list_services(db, tenant_id: ObjectId, company_id: ObjectId, default_company_id: Optional[ObjectId],
+                        limit: int, after: Optional[str], fields: Optional[str], stream: bool,
+                        model: Optional[Type[BaseModel]] = None):
+    """Same response shapes as pagination.list_response, from one aggregation."""
+    if stream:
+        # $unionWith emits the requested company's branch first, so no sort is needed
+        pipeline = services_pipeline(tenant_id, company_id, default_company_id, after) + output_stage(fields)
+        cursor = await db.services.aggregate(pipeline, batchSize=STREAM_BATCH_SIZE)
+        total = await db.services.count_documents(services_filter(tenant_id, company_id, default_company_id))
+        return StreamingResponse(iter_ndjson(cursor), media_type="application/x-ndjson",
+                                 headers={"X-Total-Count": str(total)})
+
+    cursor = await db.services.aggregate(
+        services_page_pipeline(tenant_id, company_id, default_company_id, limit, after, fields))
+    docs = await cursor.to_list()
+    # $count emits nothing when no services match
+    total = docs.pop()["_total"] if docs and "_total" in docs[-1] else 0
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_after = f"{docs[-1]['_rank']}:{docs[-1]['_id']}" if has_more else None
+    for doc in docs:
+        del doc["_rank"]
+    page = {
+        "content": docs,
+        "next_after": next_after,
+        "total": total,
+    }
+    return json_response(page, None if fields else model)
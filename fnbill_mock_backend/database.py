@@ -1,14 +1,34 @@
 import os
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient
 from dotenv import load_dotenv
 
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = "fnbill_mock"
+# One pool is shared by every request in the process; size it for the
+# number of requests a worker should have in flight at once
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 10))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 60000))
 
-client = MongoClient(MONGO_URI)
+# AsyncMongoClient doesn't connect until first use or connect(), so it is
+# safe to create at import time, before the event loop starts
+client = AsyncMongoClient(
+    MONGO_URI,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+)
 db = client[DB_NAME]
 
 def get_db():
-    return db
\ No newline at end of file
+    return db
+
+async def connect():
+    """Opens the pool and fails fast if MongoDB is unreachable."""
+    await client.aconnect()
+    await client.admin.command("ping")
+
+async def close():
+    await client.close()
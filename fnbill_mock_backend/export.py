@@ -0,0 +1,137 @@
+# export.py
+#
+# Bulk invoice PDF export as a streamed ZIP. Entries are written in _id
+# order while later invoices render in parallel, so any prefix of the
+# download is a complete run of invoices: resume an interrupted export with
+# ?after=<id of the last complete entry>. The archive ends with
+# manifest.json listing what was exported, what failed and the cursor for
+# the next batch.
+
+import asyncio
+import json
+import logging
+import os
+import zipfile
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional
+from bson import ObjectId
+from invoices import iter_invoices
+from pdf_render import TEMPLATE_VERSION, invoice_payload
+from render_service import RenderQueueFull, RenderTimeout, RenderUnavailable
+
+logger = logging.getLogger(__name__)
+
+EXPORT_MAX_INVOICES = int(os.getenv("EXPORT_MAX_INVOICES", 5000))
+PROGRESS_LOG_EVERY = 100
+
+
+class _ZipSink:
+    """A write-only file for ZipFile whose output is drained after each entry."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def export_query(tenant_id: ObjectId, company_id: Optional[ObjectId], created_from: Optional[datetime],
+                 created_to: Optional[datetime], after: Optional[ObjectId]) -> Dict:
+    # ObjectIds start with their creation time, so the date range is an _id range
+    id_range = {}
+    if created_from:
+        id_range["$gte"] = ObjectId.from_datetime(created_from)
+    if created_to:
+        id_range["$lt"] = ObjectId.from_datetime(created_to)
+    if after:
+        id_range["$gt"] = after
+    query = {"tenant_id": tenant_id}
+    if company_id:
+        query["company_id"] = company_id
+    if id_range:
+        query["_id"] = id_range
+    return query
+
+
+async def render_cached(renderer, pdf_cache, invoice: Dict) -> bytes:
+    invoice_id = str(invoice["_id"])
+    key = (invoice_id, invoice.get("revision", 0), TEMPLATE_VERSION)
+    pdf = pdf_cache.get(key)
+    if pdf is not None:
+        return pdf
+    if not invoice["company"]:
+        raise ValueError("Company details not found for this invoice")
+    payload = invoice_payload(invoice_id, invoice)
+    while True:
+        try:
+            pdf = await renderer.render(payload)
+            break
+        except RenderQueueFull:
+            # Interactive downloads share the pool; wait for room instead of failing
+            await asyncio.sleep(0.2)
+    pdf_cache.put(key, pdf)
+    return pdf
+
+
+async def iter_export_zip(db, renderer, pdf_cache, query: Dict, limit: int):
+    """Yields the ZIP archive's bytes entry by entry."""
+    sink = _ZipSink()
+    # PDFs are already compressed; storing them costs no CPU
+    archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED)
+    # Half the render queue, so exports leave room for interactive downloads
+    window = max(1, renderer.max_pending // 2)
+    pending = deque()
+    exported, failed = [], []
+    last_id = None
+
+    async def write_next():
+        invoice_id, task = pending.popleft()
+        try:
+            pdf = await task
+        except (ValueError, RenderTimeout, RenderUnavailable) as e:
+            failed.append({"id": str(invoice_id), "error": str(e)})
+        except Exception as e:
+            # Anything else (a crashed render worker, a bad document) must not truncate the ZIP
+            logger.exception(f"Exporting invoice {invoice_id} failed")
+            failed.append({"id": str(invoice_id), "error": f"{type(e).__name__}: {e}"})
+        else:
+            entry = zipfile.ZipInfo(f"invoice_{invoice_id}.pdf", date_time=invoice_id.generation_time.timetuple()[:6])
+            archive.writestr(entry, pdf)
+            exported.append(str(invoice_id))
+        done = len(exported) + len(failed)
+        if done % PROGRESS_LOG_EVERY == 0:
+            logger.info(f"Export progress: {done} invoices, {len(failed)} failed")
+        return sink.drain()
+
+    try:
+        async for invoice in iter_invoices(db, query, limit):
+            last_id = invoice["_id"]
+            pending.append((last_id, asyncio.create_task(render_cached(renderer, pdf_cache, invoice))))
+            if len(pending) >= window:
+                yield await write_next()
+        while pending:
+            yield await write_next()
+
+        hit_limit = len(exported) + len(failed) == limit
+        manifest = {
+            "exported": exported,
+            "failed": failed,
+            "next_after": str(last_id) if hit_limit and last_id else None,
+        }
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+        archive.close()
+        yield sink.drain()
+    finally:
+        # The client went away: don't keep rendering for nobody
+        for _, task in pending:
+            task.cancel()
@@ -0,0 +1,144 @@
+# indexes.py
+#
+# Indexes behind the API's hot queries. ensure_indexes runs at startup;
+# creating an index that already exists with the same keys and name is a
+# no-op, so it is safe on every boot.
+#
+#     python indexes.py            # create missing indexes
+#     python indexes.py --verify   # also explain() the hot queries; exits 1 on a collection scan or in-memory sort
+
+import asyncio
+import sys
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from catalog import services_page_pipeline
+
+INDEXES = {
+    "tenants": [
+        # Multikey: one entry per phone number, so a number belongs to one tenant
+        IndexModel([("phone_numbers", ASCENDING)], name="phone_numbers", unique=True),
+    ],
+    "services": [
+        # One range scan per company branch of the services page, in _id order
+        IndexModel([("tenant_id", ASCENDING), ("company_id", ASCENDING), ("_id", ASCENDING)],
+                   name="tenant_id_company_id__id"),
+    ],
+    "companies": [
+        IndexModel([("tenant_id", ASCENDING), ("_id", ASCENDING)], name="tenant_id__id"),
+    ],
+    "clients": [
+        IndexModel([("tenant_id", ASCENDING), ("_id", ASCENDING)], name="tenant_id__id"),
+    ],
+    "advertisements": [
+        IndexModel([("tenant_id", ASCENDING), ("_id", ASCENDING)], name="tenant_id__id"),
+    ],
+    "invoices": [
+        IndexModel([("tenant_id", ASCENDING), ("created_at", DESCENDING)], name="tenant_id_created_at"),
+        # Bulk export filters, walked in _id order
+        IndexModel([("tenant_id", ASCENDING), ("_id", ASCENDING)], name="tenant_id__id"),
+        IndexModel([("tenant_id", ASCENDING), ("company_id", ASCENDING), ("_id", ASCENDING)],
+                   name="tenant_id_company_id__id"),
+    ],
+}
+
+# (collection, filter, sort) for each hot query, checked by verify_query_plans
+_SAMPLE_ID = ObjectId()
+_OTHER_ID = ObjectId()
+HOT_QUERIES = [
+    ("tenants", {"phone_numbers": "+10000000000"}, None),
+    ("companies", {"tenant_id": _SAMPLE_ID}, [("_id", ASCENDING)]),
+    ("clients", {"tenant_id": _SAMPLE_ID}, [("_id", ASCENDING)]),
+    ("advertisements", {"tenant_id": _SAMPLE_ID}, [("_id", ASCENDING)]),
+    ("invoices", {"_id": _SAMPLE_ID, "tenant_id": _SAMPLE_ID}, None),
+    ("invoices", {"tenant_id": _SAMPLE_ID}, [("created_at", DESCENDING)]),
+    ("invoices", {"tenant_id": _SAMPLE_ID, "company_id": _SAMPLE_ID, "_id": {"$gt": _SAMPLE_ID}},
+     [("_id", ASCENDING)]),
+]
+
+# (collection, pipeline) for each hot aggregation, exactly as the endpoints run it
+HOT_PIPELINES = [
+    ("services", services_page_pipeline(_SAMPLE_ID, _SAMPLE_ID, _OTHER_ID, 20, f"0:{_SAMPLE_ID}", None)),
+]
+
+
+async def ensure_indexes(db):
+    for collection_name, models in INDEXES.items():
+        await db[collection_name].create_indexes(models)
+
+
+def plan_stages(plan):
+    """Every stage name in an explain() plan tree."""
+    stages = [plan.get("stage")] if plan.get("stage") else []
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return stages
+
+
+def winning_plans(explanation):
+    """Every winningPlan in an explain() result, including those of $unionWith sub-pipelines."""
+    if isinstance(explanation, list):
+        return [plan for item in explanation for plan in winning_plans(item)]
+    if not isinstance(explanation, dict):
+        return []
+    plans = [explanation["winningPlan"]] if "winningPlan" in explanation else []
+    for key, value in explanation.items():
+        if key != "winningPlan":
+            plans += winning_plans(value)
+    return plans
+
+
+async def explain_stages(db, collection_name, query, sort=None):
+    cursor = db[collection_name].find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    explanation = await cursor.explain()
+    return plan_stages(explanation["queryPlanner"]["winningPlan"])
+
+
+async def explain_pipeline_stages(db, collection_name, pipeline):
+    explanation = await db.command("aggregate", collection_name, pipeline=pipeline, explain=True)
+    return [stage for plan in winning_plans(explanation) for stage in plan_stages(plan)]
+
+
+def scans_or_sorts(stages):
+    return "COLLSCAN" in stages or "SORT" in stages
+
+
+async def verify_query_plans(db):
+    """Returns the hot queries and pipelines whose winning plans scan the collection or sort in memory."""
+    failures = []
+    for collection_name, query, sort in HOT_QUERIES:
+        stages = await explain_stages(db, collection_name, query, sort)
+        if scans_or_sorts(stages):
+            failures.append((collection_name, query, stages))
+    for collection_name, pipeline in HOT_PIPELINES:
+        stages = await explain_pipeline_stages(db, collection_name, pipeline)
+        if scans_or_sorts(stages):
+            failures.append((collection_name, pipeline, stages))
+    return failures
+
+
+async def main(verify):
+    from database import get_db, connect, close
+    await connect()
+    try:
+        db = get_db()
+        await ensure_indexes(db)
+        print(f"Ensured indexes on {', '.join(INDEXES)}.")
+        if not verify:
+            return 0
+        failures = await verify_query_plans(db)
+        for collection_name, query, stages in failures:
+            print(f"{collection_name} {query}: {' <- '.join(stages)}")
+        checked = len(HOT_QUERIES) + len(HOT_PIPELINES)
+        print(f"{checked - len(failures)}/{checked} hot queries use an index.")
+        return 1 if failures else 0
+    finally:
+        await close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main("--verify" in sys.argv[1:])))
@@ -0,0 +1,69 @@
+# invoices.py
+
+import logging
+from typing import Dict, Optional
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+
+# Joins an invoice's company and every referenced service (projected to
+# name and price). localField on an array matches each element; both
+# lookups use the _id index. Joined documents must belong to the invoice's
+# tenant, so an id from another tenant joins as missing.
+_SAME_TENANT = {"$match": {"$expr": {"$eq": ["$tenant_id", "$$tenant_id"]}}}
+JOIN_STAGES = [
+    {"$lookup": {
+        "from": "companies",
+        "localField": "company_id",
+        "foreignField": "_id",
+        "let": {"tenant_id": "$tenant_id"},
+        "pipeline": [_SAME_TENANT],
+        "as": "company",
+    }},
+    {"$lookup": {
+        "from": "services",
+        "localField": "services.service_id",
+        "foreignField": "_id",
+        "let": {"tenant_id": "$tenant_id"},
+        "pipeline": [_SAME_TENANT, {"$project": {"name": 1, "price": 1}}],
+        "as": "service_docs",
+    }},
+]
+
+
+def with_line_items(invoice: Dict) -> Dict:
+    """
+    Replaces the joined arrays with "company" (the company document or
+    None) and "line_items": one {service, quantity} per invoice service in
+    the invoice's order. Lines whose service no longer exists are left out.
+    """
+    invoice["company"] = invoice["company"][0] if invoice["company"] else None
+    # $lookup returns each matched service once and in no particular order
+    services_by_id = {doc["_id"]: doc for doc in invoice.pop("service_docs")}
+    line_items = []
+    for item in invoice.get("services", []):
+        service = services_by_id.get(item.get("service_id"))
+        if service is None:
+            logger.warning(f"Invoice {invoice['_id']} references missing service {item.get('service_id')}")
+            continue
+        line_items.append({"service": service, "quantity": item.get("quantity", 1)})
+    invoice["line_items"] = line_items
+    return invoice
+
+
+async def load_invoice(db, tenant_id: ObjectId, invoice_id: ObjectId) -> Optional[Dict]:
+    """The tenant's invoice with its company and services joined in, in one round trip."""
+    cursor = await db.invoices.aggregate([{"$match": {"_id": invoice_id, "tenant_id": tenant_id}}] + JOIN_STAGES)
+    results = await cursor.to_list()
+    return with_line_items(results[0]) if results else None
+
+
+async def iter_invoices(db, query: Dict, limit: Optional[int] = None, batch_size: int = 100):
+    """Joined invoices matching query in _id order, fetched batch_size at a time."""
+    pipeline = [{"$match": query}, {"$sort": {"_id": 1}}]
+    if limit:
+        pipeline.append({"$limit": limit})
+    cursor = await db.invoices.aggregate(pipeline + JOIN_STAGES, batchSize=batch_size)
+    async for invoice in cursor:
+        yield with_line_items(invoice)
@@ -29,9 +29,13 @@ model_config = ConfigDict(
     json_encoders={ObjectId: str},
     populate_by_name=True, # Allows using 'alias' field names for population
 )
+# Response documents: STRICT_RESPONSES rejects fields a model doesn't declare,
+# so an internal field (like tenant_id) leaking into a response fails loudly
+response_config = ConfigDict(**model_config, extra="forbid")
 
 # --- Sub-document Models ---
 class Address(BaseModel):
+    model_config = ConfigDict(extra="forbid")
     street_address: str
     city: str
     state: str
@@ -52,26 +56,26 @@ class Company(BaseModel):
     id: PyObjectId = Field(alias="_id")
     name: str
     main_address: Address
-    model_config = model_config
+    model_config = response_config
 
 class Client(BaseModel):
     id: PyObjectId = Field(alias="_id")
     name: str
     address_list: List[Address]
-    model_config = model_config
+    model_config = response_config
 
 class Advertisement(BaseModel):
     id: PyObjectId = Field(alias="_id")
     name: str
     file: str  # Stores the filename, e.g., 'summer_sale.jpg'
-    model_config = model_config
+    model_config = response_config
 
 class Service(BaseModel):
     id: PyObjectId = Field(alias="_id")
     name: str
     price: float
     company_id: PyObjectId
-    model_config = model_config
+    model_config = response_config
 
 class Invoice(BaseModel):
     id: PyObjectId = Field(alias="_id")
@@ -86,4 +90,29 @@ class Invoice(BaseModel):
     shipping_address: Optional[Address] = None
     # Metadata
     state: Optional[int] = None
-    model_config = model_config
\ No newline at end of file
+    model_config = model_config
+
+# --- Paginated list responses ---
+class CompanyPage(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    content: List[Company]
+    next_after: Optional[str] = None
+    total: int
+
+class ClientPage(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    content: List[Client]
+    next_after: Optional[str] = None
+    total: int
+
+class AdvertisementPage(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    content: List[Advertisement]
+    next_after: Optional[str] = None
+    total: int
+
+class ServicePage(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    content: List[Service]
+    next_after: Optional[str] = None
+    total: int
\ No newline at end of file
@@ -0,0 +1,116 @@
+# pagination.py
+
+from typing import Dict, Optional, Type
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from serialization import dumps, json_response
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Documents per chunk written to an NDJSON stream
+STREAM_BATCH_SIZE = 500
+# Stored on documents for the server's own use, never returned
+INTERNAL_FIELDS = ("tenant_id",)
+
+
+def to_jsonable(value):
+    """
+    Converts ObjectIds (at any depth) to strings, keeping the '_id' key.
+    Responses don't need it (serialization.dumps does this while encoding);
+    it is for payloads handed to non-JSON consumers.
+    """
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, dict):
+        return {key: to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_jsonable(item) for item in value]
+    return value
+
+
+def parse_object_id(value: str, name: str) -> ObjectId:
+    if not ObjectId.is_valid(value):
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: {value}")
+    return ObjectId(value)
+
+
+def parse_projection(fields: Optional[str]) -> Dict[str, int]:
+    """
+    'name,price' -> {'name': 1, 'price': 1}; '_id' is always returned.
+    Without fields, every field except INTERNAL_FIELDS is returned.
+    """
+    names = [name.strip() for name in (fields or "").split(",") if name.strip()]
+    if not names:
+        return {name: 0 for name in INTERNAL_FIELDS}
+    if any(name.startswith("$") for name in names):
+        raise HTTPException(status_code=400, detail="Invalid field name in projection")
+    # '_id' keeps the inclusion projection non-empty when only internal fields were asked for
+    return {"_id": 1, **{name: 1 for name in names if name not in INTERNAL_FIELDS}}
+
+
+def is_inclusion(projection: Dict[str, int]) -> bool:
+    return any(value == 1 for value in projection.values())
+
+
+async def count(collection, query: Dict) -> int:
+    # The collection metadata count needs no scan when there is no filter
+    if not query:
+        return await collection.estimated_document_count()
+    return await collection.count_documents(query)
+
+
+def page_query(query: Dict, after: Optional[str]) -> Dict:
+    if not after:
+        return query
+    return {**query, "_id": {"$gt": parse_object_id(after, "after")}}
+
+
+async def fetch_page(collection, query: Dict, limit: int, after: Optional[str], fields: Optional[str]) -> Dict:
+    """
+    One page in _id order. Pass the returned next_after as `after` to get
+    the next page; it is None on the last page. Seeking past `after` on the
+    _id index costs the same on every page, unlike skip().
+    """
+    # One extra document tells us whether another page exists
+    cursor = collection.find(page_query(query, after), parse_projection(fields)).sort("_id", 1).limit(limit + 1)
+    docs = await cursor.to_list()
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    return {
+        "content": docs,
+        "next_after": str(docs[-1]["_id"]) if has_more else None,
+        "total": await count(collection, query),
+    }
+
+
+async def iter_ndjson(cursor):
+    """Yields one JSON document per line, STREAM_BATCH_SIZE documents per chunk."""
+    lines = []
+    async for doc in cursor:
+        lines.append(dumps(doc))
+        if len(lines) >= STREAM_BATCH_SIZE:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+async def list_response(collection, query: Dict, limit: int, after: Optional[str], fields: Optional[str],
+                        stream: bool, model: Optional[Type[BaseModel]] = None):
+    """
+    A page as {"content", "next_after", "total"}, or with stream=True every
+    matching document as NDJSON with the total in X-Total-Count. model is
+    the page schema checked in strict mode; projected pages are partial, so
+    they are never checked.
+    """
+    if not stream:
+        page = await fetch_page(collection, query, limit, after, fields)
+        return json_response(page, None if fields else model)
+    # Validate before the response starts; errors can't be reported mid-stream
+    cursor = collection.find(page_query(query, after), parse_projection(fields)).sort("_id", 1)
+    cursor = cursor.batch_size(STREAM_BATCH_SIZE)
+    total = await count(collection, query)
+    return StreamingResponse(iter_ndjson(cursor), media_type="application/x-ndjson",
+                             headers={"X-Total-Count": str(total)})
@@ -0,0 +1,38 @@
+# pdf_cache.py
+
+import os
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+class PdfCache:
+    """
+    Rendered PDFs in least-recently-used order, evicted once their total
+    size passes max_bytes. Keys include the invoice revision, so an edited
+    invoice misses instead of needing invalidation; stale entries simply
+    age out.
+    """
+
+    def __init__(self, max_bytes=PDF_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        pdf = self._entries.get(key)
+        if pdf is not None:
+            self._entries.move_to_end(key)
+        return pdf
+
+    def put(self, key: Hashable, pdf: bytes):
+        if len(pdf) > self.max_bytes:
+            return
+        if key in self._entries:
+            self.size -= len(self._entries.pop(key))
+        self._entries[key] = pdf
+        self.size += len(pdf)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
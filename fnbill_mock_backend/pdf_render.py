@@ -0,0 +1,203 @@
+# pdf_render.py
+#
+# Invoice PDF layout. Everything here is plain Python on plain data so it
+# can run in a render worker process (see render_service.py).
+
+import io
+from typing import Dict
+from bson import ObjectId
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.lib import colors
+from reportlab.platypus import Table, TableStyle
+from pagination import to_jsonable
+
+# Part of every PDF cache key and ETag: bump it when the invoice layout changes
+TEMPLATE_VERSION = 1
+
+
+def invoice_payload(invoice_id: str, invoice: Dict) -> Dict:
+    """
+    The data render_invoice_pdf needs from a load_invoice() result, as
+    plain values that are cheap to send to a worker process.
+    """
+    company = invoice["company"]
+    return {
+        "invoice_id": invoice_id,
+        "date": ObjectId(invoice_id).generation_time.strftime("%B %d, %Y"),
+        "company": {"name": company.get("name"), "main_address": to_jsonable(company.get("main_address", {}))},
+        "billing_address": to_jsonable(invoice.get("billing_address")),
+        "shipping_address": to_jsonable(invoice.get("shipping_address")),
+        "line_items": [
+            {
+                "name": item["service"].get("name", "N/A"),
+                "price": item["service"].get("price", 0),
+                "quantity": item["quantity"],
+            }
+            for item in invoice["line_items"]
+        ],
+        "taxes": to_jsonable(invoice.get("taxes", [])),
+    }
+
+
+def render_invoice_pdf(invoice_data: Dict) -> bytes:
+    """
+    Draws an invoice payload from invoice_payload() and returns the PDF
+    bytes. Runs in a render worker process.
+    """
+    invoice_id = invoice_data["invoice_id"]
+    company_data = invoice_data["company"]
+
+    # Note: Client Name is not stored in the invoice document in the current flow.
+    # We will proceed using the stored billing/shipping addresses.
+
+    # Calculate line amounts and the subtotal
+    services_in_invoice = []
+    subtotal = 0
+    for item in invoice_data["line_items"]:
+        quantity = item["quantity"]
+        price = item["price"]
+        amount = quantity * price
+        subtotal += amount
+        services_in_invoice.append({
+            "name": item["name"],
+            "quantity": quantity,
+            "price": f"₹{price:,.2f}",
+            "amount": f"₹{amount:,.2f}"
+        })
+
+    # 2. Setup the PDF document
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+
+    # Helper function for address formatting
+    def format_address(address_dict):
+        if not isinstance(address_dict, dict):
+            return ["Address not available"]
+        # Filter out empty or None values before joining
+        parts = [
+            address_dict.get("street_address"),
+            f"{address_dict.get('city', '')}, {address_dict.get('state', '')} {address_dict.get('zip', '')}".strip(", "),
+            address_dict.get("country")
+        ]
+        return [part for part in parts if part]
+
+    # 3. Start drawing the invoice content
+    
+    # --- Header ---
+    p.setFont("Helvetica-Bold", 24)
+    p.setFillColor(colors.darkblue)
+    p.drawString(0.75 * inch, height - 1 * inch, "INVOICE")
+
+    company_name = company_data.get("name", "Company Name Not Found")
+    company_address_lines = format_address(company_data.get("main_address", {}))
+    
+    p.setFont("Helvetica-Bold", 12)
+    p.setFillColor(colors.black)
+    p.drawRightString(width - 0.75 * inch, height - 1 * inch, company_name)
+    p.setFont("Helvetica", 10)
+    
+    y_pos = height - 1.2 * inch
+    for line in company_address_lines:
+        p.drawRightString(width - 0.75 * inch, y_pos, line)
+        y_pos -= 0.18 * inch
+
+    # --- Invoice Details & Addresses ---
+    p.setStrokeColor(colors.grey)
+    p.line(0.75 * inch, height - 1.8 * inch, width - 0.75 * inch, height - 1.8 * inch)
+
+    y_pos_addr = height - 2.1 * inch
+    
+    # Bill To Address
+    p.setFont("Helvetica-Bold", 10)
+    p.drawString(0.75 * inch, y_pos_addr, "BILL TO")
+    p.setFont("Helvetica", 10)
+    billing_address_lines = format_address(invoice_data.get("billing_address", {}))
+    y_pos_bill = y_pos_addr - 0.2 * inch
+    for line in billing_address_lines:
+        p.drawString(0.75 * inch, y_pos_bill, line)
+        y_pos_bill -= 0.18 * inch
+
+    # Shipping To Address (if different)
+    shipping_address = invoice_data.get("shipping_address")
+    billing_address = invoice_data.get("billing_address")
+    if shipping_address != billing_address:
+        p.setFont("Helvetica-Bold", 10)
+        p.drawString(3.0 * inch, y_pos_addr, "SHIP TO")
+        p.setFont("Helvetica", 10)
+        shipping_address_lines = format_address(shipping_address)
+        y_pos_ship = y_pos_addr - 0.2 * inch
+        for line in shipping_address_lines:
+            p.drawString(3.0 * inch, y_pos_ship, line)
+            y_pos_ship -= 0.18 * inch
+    
+    # Invoice Number and Date
+    invoice_date = invoice_data["date"]
+    p.drawRightString(width - 0.75 * inch, y_pos_addr, f"Invoice #: {invoice_id}")
+    p.drawRightString(width - 0.75 * inch, y_pos_addr - 0.2 * inch, f"Date: {invoice_date}")
+
+    # --- Services/Items Table ---
+    table_y_start = y_pos_bill - 0.5 * inch
+    
+    table_header = [["ITEM DESCRIPTION", "QTY", "RATE", "AMOUNT"]]
+    table_data = [[s["name"], s["quantity"], s["price"], s["amount"]] for s in services_in_invoice]
+    
+    full_table_data = table_header + table_data
+    
+    item_table = Table(full_table_data, colWidths=[3.5 * inch, 0.75 * inch, 1.25 * inch, 1.5 * inch])
+    item_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('ALIGN', (0, 1), (0, -1), 'LEFT'), # Align item description to the left
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('LEFTPADDING', (0,1), (0,-1), 10),
+        ('RIGHTPADDING', (-1,1), (-1,-1), 10),
+        ('ALIGN', (-1,1), (-1,-1), 'RIGHT'), # Align amount to the right
+        ('ALIGN', (-2,1), (-2,-1), 'RIGHT'), # Align rate to the right
+    ]))
+
+    w, h = item_table.wrapOn(p, width, height)
+    item_table.drawOn(p, 0.75 * inch, table_y_start - h)
+    
+    # --- Totals Section ---
+    y_pos_totals = table_y_start - h - 0.4 * inch
+    total_due = subtotal
+    
+    p.drawRightString(width - 2.5 * inch, y_pos_totals, "Subtotal:")
+    p.drawRightString(width - 0.75 * inch, y_pos_totals, f"₹{subtotal:,.2f}")
+    y_pos_totals -= 0.25 * inch
+
+    if "taxes" in invoice_data:
+        for tax in invoice_data["taxes"]:
+            tax_name = tax.get("name", "Tax")
+            tax_percentage = tax.get("percentage", 0)
+            tax_amount = subtotal * (tax_percentage / 100)
+            total_due += tax_amount
+            p.drawRightString(width - 2.5 * inch, y_pos_totals, f"{tax_name} ({tax_percentage}%):")
+            p.drawRightString(width - 0.75 * inch, y_pos_totals, f"₹{tax_amount:,.2f}")
+            y_pos_totals -= 0.25 * inch
+
+    p.setLineWidth(2)
+    p.line(width - 3.0 * inch, y_pos_totals, width - 0.75 * inch, y_pos_totals)
+    y_pos_totals -= 0.1 * inch
+
+    p.setFont("Helvetica-Bold", 12)
+    p.drawRightString(width - 2.5 * inch, y_pos_totals - 0.2 * inch, "TOTAL DUE:")
+    p.drawRightString(width - 0.75 * inch, y_pos_totals - 0.2 * inch, f"₹{total_due:,.2f}")
+
+    # --- Footer ---
+    p.setFont("Helvetica-Oblique", 9)
+    p.setFillColor(colors.grey)
+    p.drawCentredString(width / 2.0, 0.75 * inch, "Thank you for your business!")
+
+    # 4. Save the PDF and return its bytes
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
@@ -0,0 +1,88 @@
+# render_service.py
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict
+from pdf_render import render_invoice_pdf
+
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", os.cpu_count() or 1))
+# Renders allowed in flight (running plus queued) before new ones are refused
+PDF_RENDER_MAX_PENDING = int(os.getenv("PDF_RENDER_MAX_PENDING", PDF_RENDER_WORKERS * 4))
+PDF_RENDER_TIMEOUT_SECONDS = float(os.getenv("PDF_RENDER_TIMEOUT_SECONDS", 30))
+
+
+class RenderQueueFull(Exception):
+    pass
+
+
+class RenderTimeout(Exception):
+    pass
+
+
+class RenderUnavailable(Exception):
+    pass
+
+
+class RenderService:
+    """
+    Renders invoice PDFs in a pool of worker processes, so ReportLab's CPU
+    work uses every core and never blocks the event loop. A worker that
+    dies breaks the whole pool; the pool is then replaced and the render
+    retried once.
+    """
+
+    def __init__(self, workers=PDF_RENDER_WORKERS, max_pending=PDF_RENDER_MAX_PENDING,
+                 timeout=PDF_RENDER_TIMEOUT_SECONDS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self._executor = None
+
+    def start(self):
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def render(self, payload: Dict) -> bytes:
+        """
+        Raises RenderQueueFull when max_pending renders are already in
+        flight, RenderTimeout after timeout seconds and RenderUnavailable
+        when the pool breaks again after being replaced. A timed-out render
+        that already started still finishes in its worker; its result is
+        dropped.
+        """
+        if self._executor is None:
+            # run_in_executor(None, ...) would silently render on the event loop's thread pool
+            raise RuntimeError("RenderService.start() has not been called")
+        if self.pending >= self.max_pending:
+            raise RenderQueueFull(f"{self.pending} renders already pending")
+        self.pending += 1
+        try:
+            try:
+                return await self._submit(payload)
+            except BrokenProcessPool:
+                return await self._submit(payload)
+        except BrokenProcessPool as e:
+            raise RenderUnavailable(f"Render workers keep crashing: {e}")
+        except asyncio.TimeoutError:
+            raise RenderTimeout(f"Rendering took longer than {self.timeout}s")
+        finally:
+            self.pending -= 1
+
+    async def _submit(self, payload: Dict) -> bytes:
+        executor = self._executor
+        try:
+            future = asyncio.get_running_loop().run_in_executor(executor, render_invoice_pdf, payload)
+            return await asyncio.wait_for(future, self.timeout)
+        except BrokenProcessPool:
+            # Renders that were in flight share the broken pool; only the first replaces it
+            if self._executor is executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            raise
@@ -3,15 +3,22 @@
 import pymongo
 from bson.objectid import ObjectId
 import os
+import sys
 
 # --- Configuration ---
 # It's recommended to use an environment variable for the URI in a real application
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = "fnbill_mock"
+# Phone numbers (comma separated) that may use the seeded tenant's data. Required:
+# whoever owns these numbers can read and create the tenant's invoices.
+SEED_PHONE_NUMBERS = os.getenv("SEED_PHONE_NUMBERS", "")
+seed_phone_numbers = ["+" + "".join(ch for ch in phone if ch.isdigit())
+                      for phone in SEED_PHONE_NUMBERS.split(",") if any(ch.isdigit() for ch in phone)]
 
 # --- Dummy Data Generation ---
 
 # Generate consistent ObjectIds for cross-referencing
+tenant_id = ObjectId()
 default_company_id = ObjectId()
 company1_id = ObjectId()
 company2_id = ObjectId()
@@ -27,6 +34,14 @@ ad2_id = ObjectId()
 ad3_id = ObjectId()
 ad4_id = ObjectId()
 
+tenants_data = [
+    {
+        "_id": tenant_id,
+        "name": "Demo Tenant",
+        "phone_numbers": seed_phone_numbers
+    }
+]
+
 # The first company is treated as "default" by the chat logic
 companies_data = [
     {
@@ -113,12 +128,17 @@ services_data = [
 
 def seed_database():
     """Connects to MongoDB, clears old data, and inserts new dummy data."""
+    if not seed_phone_numbers:
+        print("❌ Error: SEED_PHONE_NUMBERS is not set. Set it to the WhatsApp number(s) that should "
+              "own the demo data, e.g. SEED_PHONE_NUMBERS=+15551234567")
+        return False
     try:
         client = pymongo.MongoClient(MONGO_URI)
         db = client[DB_NAME]
         print(f"✅ Connected to MongoDB database: '{DB_NAME}'")
 
         collections = {
+            "tenants": tenants_data,
             "companies": companies_data,
             "clients": clients_data,
             "advertisements": advertisements_data,
@@ -131,6 +151,9 @@ def seed_database():
             collection.drop()
             print(f"🗑️ Dropped collection: {name}")
             if data:
+                if name != "tenants":
+                    # Every document belongs to the seeded tenant
+                    data = [{**doc, "tenant_id": tenant_id} for doc in data]
                 collection.insert_many(data)
                 print(f"🌱 Seeded {len(data)} documents into {name}")
             else:
@@ -138,10 +161,12 @@ def seed_database():
         
         print("\n✨ Database seeding completed successfully! ✨")
         client.close()
+        return True
     except pymongo.errors.ConnectionFailure as e:
         print(f"❌ Error: Could not connect to MongoDB. Please check your connection string and network access.\n{e}")
     except Exception as e:
         print(f"❌ An unexpected error occurred: {e}")
+    return False
 
 if __name__ == "__main__":
-    seed_database()
\ No newline at end of file
+    sys.exit(0 if seed_database() else 1)
\ No newline at end of file
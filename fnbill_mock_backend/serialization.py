@@ -0,0 +1,34 @@
+# serialization.py
+#
+# JSON for the list endpoints, encoded straight from Mongo documents with
+# orjson instead of through pydantic validation and jsonable_encoder.
+# bench_serialization.py measures the difference.
+
+import os
+from typing import Dict, Optional, Type
+import orjson
+from bson import ObjectId
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+# Validate every response against its pydantic model before sending it.
+# Slow; meant for development and tests.
+STRICT_RESPONSES = os.getenv("STRICT_RESPONSES", "false").lower() == "true"
+
+
+def _default(value):
+    # orjson encodes dicts, lists, str, numbers and datetimes natively and
+    # only calls this for other types, which in Mongo documents means ObjectId
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError
+
+
+def dumps(value) -> bytes:
+    return orjson.dumps(value, default=_default)
+
+
+def json_response(content: Dict, model: Optional[Type[BaseModel]] = None) -> Response:
+    if STRICT_RESPONSES and model is not None:
+        model.model_validate(content)
+    return Response(content=dumps(content), media_type="application/json")
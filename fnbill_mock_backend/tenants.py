@@ -0,0 +1,118 @@
+# tenants.py
+#
+# Maps the phone-number header to the tenant that owns the data. A tenant
+# document looks like {"_id": ObjectId, "name": str, "phone_numbers": ["+91..."]};
+# every company, client, advertisement, service and invoice carries its
+# tenant_id.
+#
+#     python tenants.py add "Acme Traders" +919800000000 +919800000001
+#     python tenants.py adopt +919800000000   # stamp documents that have no tenant yet
+
+import asyncio
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+from typing import Optional
+from bson import ObjectId
+from fastapi import HTTPException
+
+TENANT_CACHE_TTL_SECONDS = int(os.getenv("TENANT_CACHE_TTL_SECONDS", 300))
+TENANT_CACHE_SIZE = int(os.getenv("TENANT_CACHE_SIZE", 10000))
+# Unknown numbers are remembered only briefly, so a newly added tenant works at once
+TENANT_MISS_TTL_SECONDS = int(os.getenv("TENANT_MISS_TTL_SECONDS", 10))
+TENANT_COLLECTIONS = ("companies", "clients", "advertisements", "services", "invoices")
+
+
+def normalize_phone(phone_number: Optional[str]) -> Optional[str]:
+    """Same normalisation as the chat backend: '+' followed by the digits."""
+    digits = re.sub(r"[^\d]", "", phone_number or "")
+    return f"+{digits}" if digits else None
+
+
+class TenantResolver:
+    """
+    Cached phone number -> tenant id lookups, least recently used evicted
+    past max_size. Unknown numbers are cached for miss_ttl_seconds, so a
+    stranger retrying doesn't reach the database on every request.
+    """
+
+    def __init__(self, db, ttl_seconds=TENANT_CACHE_TTL_SECONDS, max_size=TENANT_CACHE_SIZE,
+                 miss_ttl_seconds=TENANT_MISS_TTL_SECONDS):
+        self.db = db
+        self.ttl_seconds = ttl_seconds
+        self.miss_ttl_seconds = miss_ttl_seconds
+        self.max_size = max_size
+        self._cache = OrderedDict()
+
+    def invalidate(self, phone_number: Optional[str] = None):
+        if phone_number is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(normalize_phone(phone_number), None)
+
+    async def resolve(self, phone_number: Optional[str]) -> ObjectId:
+        """The caller's tenant id; 400 without a phone number, 403 for an unknown one."""
+        phone = normalize_phone(phone_number)
+        if phone is None:
+            raise HTTPException(status_code=400, detail="Phone number header is missing")
+        cached = self._cache.get(phone)
+        if cached is not None and time.monotonic() < cached[1]:
+            self._cache.move_to_end(phone)
+            tenant_id = cached[0]
+        else:
+            tenant = await self.db.tenants.find_one({"phone_numbers": phone}, {"_id": 1})
+            tenant_id = tenant["_id"] if tenant else None
+            ttl = self.ttl_seconds if tenant_id is not None else self.miss_ttl_seconds
+            self._cache[phone] = (tenant_id, time.monotonic() + ttl)
+            self._cache.move_to_end(phone)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        if tenant_id is None:
+            raise HTTPException(status_code=403, detail="No fnBill account for this phone number")
+        return tenant_id
+
+
+async def add_tenant(db, name, phone_numbers):
+    result = await db.tenants.insert_one({"name": name, "phone_numbers": [normalize_phone(p) for p in phone_numbers]})
+    return result.inserted_id
+
+
+async def adopt_unscoped(db, tenant_id):
+    """Stamps tenant_id on every document that predates tenant scoping."""
+    counts = {}
+    for name in TENANT_COLLECTIONS:
+        result = await db[name].update_many({"tenant_id": {"$exists": False}}, {"$set": {"tenant_id": tenant_id}})
+        counts[name] = result.modified_count
+    return counts
+
+
+async def main(args):
+    from database import get_db, connect, close
+    await connect()
+    try:
+        db = get_db()
+        if len(args) >= 3 and args[0] == "add":
+            tenant_id = await add_tenant(db, args[1], args[2:])
+            print(f"Created tenant {tenant_id} for {', '.join(args[2:])}.")
+        elif len(args) == 2 and args[0] == "adopt":
+            tenant = await db.tenants.find_one({"phone_numbers": normalize_phone(args[1])})
+            if not tenant:
+                print(f"No tenant has phone number {args[1]}.")
+                return 1
+            for name, count in (await adopt_unscoped(db, tenant["_id"])).items():
+                print(f"{name}: {count} documents assigned to tenant {tenant['_id']}")
+        else:
+            print("usage: python tenants.py add NAME PHONE... | python tenants.py adopt PHONE\n"
+                  f"Running servers may take up to {TENANT_MISS_TTL_SECONDS}s (TENANT_MISS_TTL_SECONDS) to "
+                  f"accept a newly added number, and up to {TENANT_CACHE_TTL_SECONDS}s "
+                  "(TENANT_CACHE_TTL_SECONDS) to drop a removed one.")
+            return 1
+        return 0
+    finally:
+        await close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
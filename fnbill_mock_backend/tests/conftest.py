@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The server's modules are flat scripts run from their own directory
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
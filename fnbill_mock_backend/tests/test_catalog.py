@@ -0,0 +1,157 @@
+import asyncio
+import json
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from catalog import list_services, parse_service_cursor, services_pipeline
+from pagination import is_inclusion
+
+
+def matches(doc, match):
+    for field, condition in match.items():
+        value = doc.get(field)
+        if isinstance(condition, dict):
+            if "$gt" in condition and not value > condition["$gt"]:
+                return False
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def run_pipeline(docs, pipeline, collections):
+    """Just enough of the aggregation language for the services pipelines."""
+    docs = [dict(doc) for doc in docs]
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            docs = [doc for doc in docs if matches(doc, spec)]
+        elif name == "$sort":
+            for field, direction in reversed(list(spec.items())):
+                docs.sort(key=lambda doc: doc[field], reverse=direction < 0)
+        elif name == "$limit":
+            docs = docs[:spec]
+        elif name == "$addFields":
+            docs = [{**doc, **spec} for doc in docs]
+        elif name == "$project":
+            if is_inclusion(spec):
+                docs = [{key: value for key, value in doc.items() if spec.get(key)} for doc in docs]
+            else:
+                docs = [{key: value for key, value in doc.items() if key not in spec} for doc in docs]
+        elif name == "$unionWith":
+            docs = docs + run_pipeline(collections[spec["coll"]], spec["pipeline"], collections)
+        elif name == "$count":
+            docs = [{spec: len(docs)}] if docs else []
+        else:
+            raise AssertionError(f"unexpected stage {name}")
+    return docs
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self):
+        return self.docs
+
+
+class FakeServices:
+    def __init__(self, collections):
+        self.collections = collections
+        self.pipelines = []
+
+    async def aggregate(self, pipeline, **kwargs):
+        self.pipelines.append(pipeline)
+        return FakeCursor(run_pipeline(self.collections["services"], pipeline, self.collections))
+
+
+class FakeDb:
+    def __init__(self, services):
+        self.services = FakeServices({"services": services})
+
+
+@pytest.fixture
+def catalog():
+    tenant, company, default = ObjectId(), ObjectId(), ObjectId()
+    services = []
+    for owner, count in ((company, 3), (default, 2)):
+        services += [{"_id": ObjectId(), "tenant_id": tenant, "company_id": owner, "name": f"{owner} {i}",
+                      "price": 10.0 + i} for i in range(count)]
+    # Another tenant's service in the same company must never show up
+    services.append({"_id": ObjectId(), "tenant_id": ObjectId(), "company_id": company, "name": "foreign",
+                     "price": 1.0})
+    return tenant, company, default, services
+
+
+def list_page(db, tenant, company, default, limit, after=None, fields=None):
+    response = asyncio.run(list_services(db, tenant, company, default, limit, after, fields, False))
+    return json.loads(response.body)
+
+
+def test_service_cursor_round_trip():
+    service_id = ObjectId()
+    assert parse_service_cursor(f"1:{service_id}") == (1, service_id)
+
+
+@pytest.mark.parametrize("after", ["", "2:612345678901234567890123", "0:nope", "612345678901234567890123"])
+def test_invalid_service_cursor(after):
+    with pytest.raises(HTTPException) as error:
+        parse_service_cursor(after)
+    assert error.value.status_code == 400
+
+
+def test_pipeline_unions_the_default_company():
+    tenant, company, default = ObjectId(), ObjectId(), ObjectId()
+    pipeline = services_pipeline(tenant, company, default)
+    assert pipeline[0] == {"$match": {"tenant_id": tenant, "company_id": company}}
+    assert pipeline[-1]["$unionWith"]["pipeline"][0] == {"$match": {"tenant_id": tenant, "company_id": default}}
+
+
+def test_pipeline_without_a_distinct_default_company():
+    tenant, company = ObjectId(), ObjectId()
+    for default in (None, company):
+        assert all("$unionWith" not in stage for stage in services_pipeline(tenant, company, default))
+
+
+def test_cursor_past_the_requested_company_skips_its_branch():
+    tenant, company, default, after_id = ObjectId(), ObjectId(), ObjectId(), ObjectId()
+    pipeline = services_pipeline(tenant, company, default, f"1:{after_id}")
+    assert pipeline[0] == {"$match": {"tenant_id": tenant, "company_id": default, "_id": {"$gt": after_id}}}
+    assert services_pipeline(tenant, company, None, f"1:{after_id}") == [{"$match": {"_id": {"$in": []}}}]
+
+
+def test_pages_walk_both_companies_in_order(catalog):
+    tenant, company, default, services = catalog
+    db = FakeDb(services)
+    names, after = [], None
+    while True:
+        page = list_page(db, tenant, company, default, 2, after)
+        assert page["total"] == 5
+        assert all(set(doc) == {"_id", "company_id", "name", "price"} for doc in page["content"])
+        names += [doc["name"] for doc in page["content"]]
+        after = page["next_after"]
+        if after is None:
+            break
+    assert names == [f"{company} {i}" for i in range(3)] + [f"{default} {i}" for i in range(2)]
+
+
+def test_page_cursor_carries_the_company_rank(catalog):
+    tenant, company, default, services = catalog
+    db = FakeDb(services)
+    page = list_page(db, tenant, company, default, 4)
+    assert page["next_after"].startswith("1:")
+    assert list_page(db, tenant, company, default, 4, page["next_after"])["content"][0]["name"] == f"{default} 1"
+
+
+def test_projected_page_keeps_only_the_fields(catalog):
+    tenant, company, default, services = catalog
+    page = list_page(FakeDb(services), tenant, company, default, 10, fields="name")
+    assert all(set(doc) == {"_id", "name"} for doc in page["content"])
+
+
+def test_empty_catalog_has_zero_total():
+    page = list_page(FakeDb([]), ObjectId(), ObjectId(), ObjectId(), 10)
+    assert page == {"content": [], "next_after": None, "total": 0}
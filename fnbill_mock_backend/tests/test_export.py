@@ -0,0 +1,161 @@
+import asyncio
+import io
+import json
+import zipfile
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+
+import export
+from export import export_query, iter_export_zip
+from pdf_cache import PdfCache
+from pdf_render import TEMPLATE_VERSION
+from render_service import RenderQueueFull, RenderTimeout
+
+
+class FakeRenderer:
+    """
+    Each render takes 10ms longer than the one before; failures maps invoice
+    ids to the exception to raise.
+    """
+
+    def __init__(self, max_pending=4, failures=None, full_once=()):
+        self.max_pending = max_pending
+        self.failures = failures or {}
+        self.full_once = set(full_once)
+        self.rendered = []
+        self.started = 0
+        self.cancelled = 0
+
+    async def render(self, payload):
+        invoice_id = payload["invoice_id"]
+        if invoice_id in self.full_once:
+            self.full_once.discard(invoice_id)
+            raise RenderQueueFull("busy")
+        self.started += 1
+        try:
+            await asyncio.sleep(0.01 * self.started)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if invoice_id in self.failures:
+            raise self.failures[invoice_id]
+        self.rendered.append(invoice_id)
+        return f"%PDF {invoice_id}".encode()
+
+
+def make_invoices(count, company=True):
+    return [{"_id": ObjectId(), "revision": 0, "company": {"name": "Acme"} if company else None,
+             "line_items": []} for _ in range(count)]
+
+
+@pytest.fixture
+def invoices(monkeypatch):
+    docs = make_invoices(6)
+
+    async def fake_iter_invoices(db, query, limit):
+        for doc in docs[:limit]:
+            yield doc
+
+    monkeypatch.setattr(export, "iter_invoices", fake_iter_invoices)
+    return docs
+
+
+def collect(renderer, limit, pdf_cache=None):
+    async def run():
+        return [chunk async for chunk in iter_export_zip(None, renderer, pdf_cache or PdfCache(), {}, limit)]
+    return asyncio.run(run())
+
+
+def open_zip(chunks):
+    return zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+
+
+def test_export_query_turns_dates_into_an_id_range():
+    tenant, company, after = ObjectId(), ObjectId(), ObjectId()
+    start, end = datetime(2024, 1, 1, tzinfo=timezone.utc), datetime(2024, 2, 1, tzinfo=timezone.utc)
+    assert export_query(tenant, None, None, None, None) == {"tenant_id": tenant}
+    query = export_query(tenant, company, start, end, after)
+    assert query["company_id"] == company
+    assert query["_id"] == {"$gte": ObjectId.from_datetime(start), "$lt": ObjectId.from_datetime(end), "$gt": after}
+
+
+def test_archive_is_streamed_entry_by_entry(invoices):
+    chunks = collect(FakeRenderer(), 10)
+    # One chunk per entry plus the central directory
+    assert len(chunks) == len(invoices) + 1
+    archive = open_zip(chunks)
+    assert archive.testzip() is None
+    names = [f"invoice_{doc['_id']}.pdf" for doc in invoices]
+    assert archive.namelist() == names + ["manifest.json"]
+    assert archive.read(names[0]) == f"%PDF {invoices[0]['_id']}".encode()
+    manifest = json.loads(archive.read("manifest.json"))
+    assert manifest == {"exported": [str(doc["_id"]) for doc in invoices], "failed": [], "next_after": None}
+
+
+def test_failures_are_listed_without_truncating_the_archive(invoices):
+    renderer = FakeRenderer(failures={
+        str(invoices[1]["_id"]): RenderTimeout("too slow"),
+        str(invoices[3]["_id"]): OSError("worker vanished"),
+    })
+    archive = open_zip(collect(renderer, 10))
+    manifest = json.loads(archive.read("manifest.json"))
+    assert manifest["failed"] == [
+        {"id": str(invoices[1]["_id"]), "error": "too slow"},
+        {"id": str(invoices[3]["_id"]), "error": "OSError: worker vanished"},
+    ]
+    assert len(manifest["exported"]) == 4
+    assert len(archive.namelist()) == 5
+
+
+def test_invoice_without_company_fails_alone(monkeypatch):
+    docs = make_invoices(2)
+    docs[0]["company"] = None
+
+    async def fake_iter_invoices(db, query, limit):
+        for doc in docs:
+            yield doc
+
+    monkeypatch.setattr(export, "iter_invoices", fake_iter_invoices)
+    manifest = json.loads(open_zip(collect(FakeRenderer(), 10)).read("manifest.json"))
+    assert manifest["failed"] == [{"id": str(docs[0]["_id"]), "error": "Company details not found for this invoice"}]
+    assert manifest["exported"] == [str(docs[1]["_id"])]
+
+
+def test_limit_sets_next_after(invoices):
+    manifest = json.loads(open_zip(collect(FakeRenderer(), 4)).read("manifest.json"))
+    assert manifest["exported"] == [str(doc["_id"]) for doc in invoices[:4]]
+    assert manifest["next_after"] == str(invoices[3]["_id"])
+
+
+def test_cached_pdfs_are_not_rendered_again(invoices):
+    pdf_cache = PdfCache()
+    pdf_cache.put((str(invoices[0]["_id"]), 0, TEMPLATE_VERSION), b"%PDF cached")
+    renderer = FakeRenderer()
+    archive = open_zip(collect(renderer, 10, pdf_cache))
+    assert archive.read(f"invoice_{invoices[0]['_id']}.pdf") == b"%PDF cached"
+    assert str(invoices[0]["_id"]) not in renderer.rendered
+    assert pdf_cache.get((str(invoices[1]["_id"]), 0, TEMPLATE_VERSION)) is not None
+
+
+def test_full_render_queue_is_waited_out(invoices):
+    renderer = FakeRenderer(full_once=[str(invoices[2]["_id"])])
+    manifest = json.loads(open_zip(collect(renderer, 10)).read("manifest.json"))
+    assert manifest["failed"] == []
+    assert len(manifest["exported"]) == len(invoices)
+
+
+def test_disconnect_cancels_pending_renders(invoices):
+    renderer = FakeRenderer(max_pending=8)
+
+    async def run():
+        stream = iter_export_zip(None, renderer, PdfCache(), {}, 10)
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+    # A window of 4: the first entry was written, the next three were still rendering
+    assert renderer.cancelled == 3
+    assert renderer.rendered == [str(invoices[0]["_id"])]
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from pagination import INTERNAL_FIELDS, fetch_page, is_inclusion, page_query, parse_projection
+
+
+def matches(doc, query):
+    for field, condition in query.items():
+        if isinstance(condition, dict):
+            if not doc.get(field) > condition["$gt"]:
+                return False
+        elif doc.get(field) != condition:
+            return False
+    return True
+
+
+def project(doc, projection):
+    if is_inclusion(projection):
+        return {key: value for key, value in doc.items() if projection.get(key)}
+    return {key: value for key, value in doc.items() if key not in projection}
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs = sorted(self.docs, key=lambda doc: doc[field], reverse=direction < 0)
+        return self
+
+    def limit(self, limit):
+        self.docs = self.docs[:limit]
+        return self
+
+    async def to_list(self):
+        return self.docs
+
+
+class FakeCollection:
+    """The part of an AsyncCollection that fetch_page uses."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.finds = []
+
+    def find(self, query, projection):
+        self.finds.append((query, projection))
+        return FakeCursor([project(doc, projection) for doc in self.docs if matches(doc, query)])
+
+    async def count_documents(self, query):
+        return sum(1 for doc in self.docs if matches(doc, query))
+
+    async def estimated_document_count(self):
+        return len(self.docs)
+
+
+@pytest.fixture
+def tenant():
+    return ObjectId()
+
+
+@pytest.fixture
+def collection(tenant):
+    other = ObjectId()
+    docs = [{"_id": ObjectId(), "tenant_id": tenant, "name": f"Client {i}", "city": "Pune"} for i in range(5)]
+    docs += [{"_id": ObjectId(), "tenant_id": other, "name": "Someone else's", "city": "Mumbai"}]
+    return FakeCollection(docs)
+
+
+def test_projection_without_fields_hides_internal_fields():
+    assert parse_projection(None) == {name: 0 for name in INTERNAL_FIELDS}
+    assert parse_projection(" , ") == {name: 0 for name in INTERNAL_FIELDS}
+    assert not is_inclusion(parse_projection(None))
+
+
+def test_projection_with_fields_always_returns_id():
+    assert parse_projection("name, price") == {"_id": 1, "name": 1, "price": 1}
+
+
+def test_projection_never_includes_internal_fields():
+    projection = parse_projection("tenant_id")
+    assert projection == {"_id": 1}
+    assert is_inclusion(projection)
+
+
+def test_projection_rejects_operators():
+    with pytest.raises(HTTPException) as error:
+        parse_projection("name,$where")
+    assert error.value.status_code == 400
+
+
+def test_page_query_seeks_past_after(tenant):
+    after = ObjectId()
+    assert page_query({"tenant_id": tenant}, None) == {"tenant_id": tenant}
+    assert page_query({"tenant_id": tenant}, str(after)) == {"tenant_id": tenant, "_id": {"$gt": after}}
+
+
+def test_page_query_rejects_invalid_cursor():
+    with pytest.raises(HTTPException) as error:
+        page_query({}, "not-an-id")
+    assert error.value.status_code == 400
+
+
+def test_pages_follow_next_after_to_the_end(collection, tenant):
+    query = {"tenant_id": tenant}
+    names, after, pages = [], None, 0
+    while True:
+        page = asyncio.run(fetch_page(collection, query, 2, after, None))
+        pages += 1
+        assert page["total"] == 5
+        names += [doc["name"] for doc in page["content"]]
+        after = page["next_after"]
+        if after is None:
+            break
+    assert pages == 3
+    assert names == [f"Client {i}" for i in range(5)]
+
+
+def test_exact_last_page_has_no_next_after(collection, tenant):
+    page = asyncio.run(fetch_page(collection, {"tenant_id": tenant}, 5, None, None))
+    assert len(page["content"]) == 5
+    assert page["next_after"] is None
+
+
+def test_pages_never_contain_tenant_id(collection, tenant):
+    for fields in (None, "name,tenant_id"):
+        page = asyncio.run(fetch_page(collection, {"tenant_id": tenant}, 10, None, fields))
+        assert all("tenant_id" not in doc for doc in page["content"])
+
+
+def test_fields_project_the_page(collection, tenant):
+    page = asyncio.run(fetch_page(collection, {"tenant_id": tenant}, 10, None, "name"))
+    assert all(set(doc) == {"_id", "name"} for doc in page["content"])
@@ -0,0 +1,99 @@
+import asyncio
+import multiprocessing
+import os
+import time
+
+import pytest
+
+import render_service
+from render_service import RenderQueueFull, RenderService, RenderTimeout, RenderUnavailable
+
+# Workers must inherit the monkeypatched render function
+pytestmark = pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(),
+                                reason="needs the fork start method")
+
+
+def echo(payload):
+    return payload["invoice_id"].encode()
+
+
+def crash_once(payload):
+    # The marker file outlives the worker that dies, so the retry succeeds
+    if not os.path.exists(payload["marker"]):
+        open(payload["marker"], "w").close()
+        os._exit(1)
+    return b"rendered"
+
+
+def crash(payload):
+    os._exit(1)
+
+
+def slow(payload):
+    time.sleep(1)
+    return b"late"
+
+
+@pytest.fixture
+def service():
+    service = RenderService(workers=1, max_pending=2, timeout=5)
+    yield service
+    service.shutdown()
+
+
+def test_render_before_start_is_refused(service):
+    with pytest.raises(RuntimeError):
+        asyncio.run(service.render({"invoice_id": "x"}))
+
+
+def test_render_runs_in_a_worker(service, monkeypatch):
+    monkeypatch.setattr(render_service, "render_invoice_pdf", echo)
+    service.start()
+    assert asyncio.run(service.render({"invoice_id": "abc"})) == b"abc"
+    assert service.pending == 0
+
+
+def test_crashed_worker_is_replaced_and_the_render_retried(service, monkeypatch, tmp_path):
+    monkeypatch.setattr(render_service, "render_invoice_pdf", crash_once)
+    service.start()
+    broken = service._executor
+    assert asyncio.run(service.render({"marker": str(tmp_path / "crashed")})) == b"rendered"
+    assert service._executor is not broken
+    assert service.pending == 0
+
+
+def test_pool_that_keeps_crashing_is_unavailable(service, monkeypatch):
+    monkeypatch.setattr(render_service, "render_invoice_pdf", crash)
+    service.start()
+    with pytest.raises(RenderUnavailable):
+        asyncio.run(service.render({}))
+    assert service.pending == 0
+
+
+def test_slow_render_times_out(monkeypatch):
+    monkeypatch.setattr(render_service, "render_invoice_pdf", slow)
+    service = RenderService(workers=1, max_pending=2, timeout=0.1)
+    service.start()
+    try:
+        with pytest.raises(RenderTimeout):
+            asyncio.run(service.render({}))
+        assert service.pending == 0
+    finally:
+        service.shutdown()
+
+
+def test_queue_full_is_refused(service, monkeypatch):
+    monkeypatch.setattr(render_service, "render_invoice_pdf", slow)
+    service.start()
+
+    async def run():
+        renders = [asyncio.create_task(service.render({})) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(RenderQueueFull):
+            await service.render({})
+        for task in renders:
+            task.cancel()
+        await asyncio.gather(*renders, return_exceptions=True)
+
+    asyncio.run(run())
+    assert service.pending == 0
@@ -0,0 +1,64 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+from pydantic import ValidationError
+
+import serialization
+from models import ClientPage, ServicePage
+from serialization import dumps, json_response
+
+
+def client(**extra):
+    return {"_id": ObjectId(), "name": "Acme",
+            "address_list": [{"street_address": "1 Main Street", "city": "Pune", "state": "MH", "zip": "411001"}],
+            **extra}
+
+
+@pytest.fixture
+def strict(monkeypatch):
+    monkeypatch.setattr(serialization, "STRICT_RESPONSES", True)
+
+
+def test_object_ids_are_encoded_at_any_depth():
+    company_id, service_id = ObjectId(), ObjectId()
+    doc = {"_id": service_id, "company_id": company_id, "nested": [{"id": company_id}],
+           "created_at": datetime(2024, 1, 1, tzinfo=timezone.utc)}
+    assert json.loads(dumps(doc)) == {"_id": str(service_id), "company_id": str(company_id),
+                                      "nested": [{"id": str(company_id)}], "created_at": "2024-01-01T00:00:00+00:00"}
+
+
+def test_unknown_types_are_not_encoded_silently():
+    with pytest.raises(TypeError):
+        dumps({"value": object()})
+
+
+def test_page_is_encoded_as_is():
+    page = {"content": [client()], "next_after": None, "total": 1}
+    response = json_response(page, ClientPage)
+    assert response.media_type == "application/json"
+    assert json.loads(response.body)["content"][0]["_id"] == str(page["content"][0]["_id"])
+
+
+def test_strict_mode_accepts_a_valid_page(strict):
+    json_response({"content": [client()], "next_after": None, "total": 1}, ClientPage)
+    service = {"_id": ObjectId(), "name": "Repair", "price": 10.0, "company_id": ObjectId()}
+    json_response({"content": [service], "next_after": "0:" + str(service["_id"]), "total": 3}, ServicePage)
+
+
+@pytest.mark.parametrize("page", [
+    {"content": [client(tenant_id=ObjectId())], "next_after": None, "total": 1},
+    {"content": [client()], "next_after": None, "total": 1, "debug": True},
+    {"content": [client(address_list=[{"street_address": "1", "city": "Pune", "state": "MH", "zip": "1",
+                                       "tenant_id": ObjectId()}])], "next_after": None, "total": 1},
+    {"content": [{"_id": ObjectId(), "name": "Acme"}], "next_after": None, "total": 1},
+])
+def test_strict_mode_rejects_leaked_or_missing_fields(strict, page):
+    with pytest.raises(ValidationError):
+        json_response(page, ClientPage)
+
+
+def test_leaks_pass_unnoticed_outside_strict_mode():
+    # Why STRICT_RESPONSES exists: the fast path does not look at the fields
+    json_response({"content": [client(tenant_id=ObjectId())], "next_after": None, "total": 1}, ClientPage)
@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from tenants import TenantResolver, normalize_phone
+
+
+class FakeTenants:
+    def __init__(self, tenants):
+        self.tenants = tenants
+        self.lookups = 0
+
+    async def find_one(self, query, projection):
+        self.lookups += 1
+        for tenant in self.tenants:
+            if query["phone_numbers"] in tenant["phone_numbers"]:
+                return {"_id": tenant["_id"]}
+        return None
+
+
+class FakeDb:
+    def __init__(self, tenants):
+        self.tenants = FakeTenants(tenants)
+
+
+@pytest.fixture
+def tenant():
+    return {"_id": ObjectId(), "phone_numbers": ["+919800000000"]}
+
+
+@pytest.fixture
+def db(tenant):
+    return FakeDb([tenant])
+
+
+def resolve(resolver, phone_number):
+    return asyncio.run(resolver.resolve(phone_number))
+
+
+def status_of(resolver, phone_number):
+    with pytest.raises(HTTPException) as error:
+        resolve(resolver, phone_number)
+    return error.value.status_code
+
+
+def test_normalize_phone():
+    assert normalize_phone("whatsapp:+91 98000-00000") == "+919800000000"
+    assert normalize_phone("") is None
+    assert normalize_phone(None) is None
+
+
+def test_known_number_is_cached(db, tenant):
+    resolver = TenantResolver(db)
+    assert resolve(resolver, "+91 9800000000") == tenant["_id"]
+    assert resolve(resolver, "whatsapp:+919800000000") == tenant["_id"]
+    assert db.tenants.lookups == 1
+
+
+def test_missing_header_is_a_bad_request(db):
+    assert status_of(TenantResolver(db), None) == 400
+    assert db.tenants.lookups == 0
+
+
+def test_unknown_number_is_forbidden_and_remembered_briefly(db, tenant):
+    resolver = TenantResolver(db, miss_ttl_seconds=0.05)
+    assert status_of(resolver, "+911111111111") == 403
+    assert status_of(resolver, "+911111111111") == 403
+    assert db.tenants.lookups == 1
+    # The number is added; after the miss TTL it works without a restart
+    tenant["phone_numbers"].append("+911111111111")
+    time.sleep(0.06)
+    assert resolve(resolver, "+911111111111") == tenant["_id"]
+    assert db.tenants.lookups == 2
+
+
+def test_hits_expire_after_the_ttl(db, tenant):
+    resolver = TenantResolver(db, ttl_seconds=0.05)
+    resolve(resolver, "+919800000000")
+    tenant["phone_numbers"].remove("+919800000000")
+    time.sleep(0.06)
+    assert status_of(resolver, "+919800000000") == 403
+
+
+def test_least_recently_used_number_is_evicted(db, tenant):
+    resolver = TenantResolver(db, max_size=2)
+    tenant["phone_numbers"] += ["+911", "+912"]
+    resolve(resolver, "+919800000000")
+    resolve(resolver, "+911")
+    resolve(resolver, "+919800000000")
+    resolve(resolver, "+912")
+    lookups = db.tenants.lookups
+    resolve(resolver, "+919800000000")
+    assert db.tenants.lookups == lookups
+    resolve(resolver, "+911")
+    assert db.tenants.lookups == lookups + 1
+
+
+def test_invalidate_forgets_a_number(db, tenant):
+    resolver = TenantResolver(db)
+    resolve(resolver, "+919800000000")
+    resolver.invalidate("+91 98000 00000")
+    resolve(resolver, "+919800000000")
+    assert db.tenants.lookups == 2
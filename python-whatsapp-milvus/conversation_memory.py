@@ -0,0 +1,84 @@
+import json
+import os
+import time
+
+MEMORY_TOP_K = int(os.getenv("MEMORY_TOP_K", 5))
+MEMORY_WINDOW_DAYS = int(os.getenv("MEMORY_WINDOW_DAYS", 30))
+MEMORY_NPROBE = int(os.getenv("MEMORY_NPROBE", 16))
+MEMORY_EF = int(os.getenv("MEMORY_EF", 64))
+# How often the index type behind the alias is re-read; a reindex may switch it
+MEMORY_INDEX_REFRESH_SECONDS = float(os.getenv("MEMORY_INDEX_REFRESH_SECONDS", 10))
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+class ConversationMemory:
+    """
+    Stores WhatsApp messages in whatsapp_collection and retrieves a user's
+    most relevant past messages.
+
+    from_number is the collection's partition key, so Milvus routes a
+    search filtered on it to the single partition holding that user's
+    rows. The INVERTED index on from_number then filters within that
+    partition.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.collection.load()
+        self._index_type = None
+        self._index_read_at = 0.0
+
+    def index_type(self):
+        """The embedding index type, re-read every MEMORY_INDEX_REFRESH_SECONDS."""
+        if self._index_type is None or time.monotonic() - self._index_read_at >= MEMORY_INDEX_REFRESH_SECONDS:
+            self._index_type = next((i.params.get("index_type") for i in self.collection.indexes
+                                     if i.field_name == "embedding"), None)
+            self._index_read_at = time.monotonic()
+        return self._index_type
+
+    def search_param(self, k):
+        params = {"ef": max(MEMORY_EF, k)} if self.index_type() == "HNSW" else {"nprobe": MEMORY_NPROBE}
+        return {"metric_type": "L2", "params": params}
+
+    def add(self, from_number, body, timestamp_ms, embedding):
+        # No flush here: growing segments are already searchable, and a flush
+        # per message leaves behind thousands of tiny sealed segments.
+        self.collection.insert([[from_number], [body], [timestamp_ms], [embedding]])
+
+    def search(self, from_number, embedding, k=MEMORY_TOP_K, since=None, until=None):
+        """
+        Returns up to k of from_number's past messages closest to embedding,
+        as dicts with "content", "timestamp" and "distance". since and until
+        bound the message time in epoch milliseconds.
+        """
+        # json.dumps yields a quoted, escaped string literal for the filter.
+        filters = [f"from_number == {json.dumps(from_number)}"]
+        if since is not None:
+            filters.append(f"timestamp >= {int(since)}")
+        if until is not None:
+            filters.append(f"timestamp < {int(until)}")
+
+        results = self.collection.search(
+            data=[embedding],
+            anns_field="embedding",
+            param=self.search_param(k),
+            limit=k,
+            expr=" and ".join(filters),
+            output_fields=["body", "timestamp"],
+        )
+        return [
+            {
+                "content": hit.entity.get("body"),
+                "timestamp": hit.entity.get("timestamp"),
+                "distance": hit.distance,
+            }
+            for hit in results[0]
+        ]
+
+    def recent_context(self, from_number, embedding, k=MEMORY_TOP_K, window_days=MEMORY_WINDOW_DAYS):
+        """Searches the last window_days of from_number's messages."""
+        since = now_ms() - window_days * 24 * 3600 * 1000
+        return self.search(from_number, embedding, k=k, since=since)
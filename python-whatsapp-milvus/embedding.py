@@ -1,5 +1,11 @@
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+import asyncio
 import os
+import queue
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock, Thread, Timer
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,18 +16,111 @@ if not api_key:
     raise ValueError("GOOGLE_API_KEY not found in environment variables.")
 genai.configure(api_key=api_key)
 
-def get_embedding(text, model="models/embedding-001"):
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", 100))  # batch limit of embed_content
+EMBED_MAX_WAIT_MS = int(os.getenv("EMBED_MAX_WAIT_MS", 10))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", 4))
+EMBED_MAX_ATTEMPTS = 3
+# How long get_embedding waits; keep it well inside Twilio's webhook timeout
+EMBED_TIMEOUT_SECONDS = float(os.getenv("EMBED_TIMEOUT_SECONDS", 5))
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding requests into batched embed_content calls.
+
+    Requests are collected until max_batch_size items are waiting or
+    max_wait_ms has passed since the first one. They are grouped by task
+    type, embedded with one API call per group, and each caller's future
+    is resolved with its own vector. Transient errors (rate limits, 5xx,
+    timeouts) retry the whole batch with backoff. A batch rejected for its
+    input (400) is split in half until the bad inputs are isolated, so one
+    bad input fails only its own request.
+    """
+
+    def __init__(self, model="models/embedding-001", max_batch_size=EMBED_MAX_BATCH_SIZE,
+                 max_wait_ms=EMBED_MAX_WAIT_MS, concurrency=EMBED_CONCURRENCY, max_attempts=EMBED_MAX_ATTEMPTS):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_attempts = max_attempts
+        self._queue = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embed")
+        Thread(target=self._collect, daemon=True, name="embed-batcher").start()
+
+    def submit(self, text, task_type="RETRIEVAL_DOCUMENT"):
+        """Queues text for embedding and returns a Future for its vector."""
+        future = Future()
+        self._queue.put((text, task_type, future))
+        return future
+
+    async def embed(self, text, task_type="RETRIEVAL_DOCUMENT"):
+        return await asyncio.wrap_future(self.submit(text, task_type))
+
+    def _collect(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            by_task_type = {}
+            for item in batch:
+                by_task_type.setdefault(item[1], []).append(item)
+            for task_type, items in by_task_type.items():
+                self._executor.submit(self._embed_batch, task_type, items, 1)
+
+    def _embed_batch(self, task_type, items, attempt):
+        try:
+            result = genai.embed_content(
+                model=self.model,
+                content=[text for text, _, _ in items],
+                task_type=task_type,
+            )
+            for (_, _, future), vector in zip(items, result['embedding']):
+                future.set_result(vector)
+        except google_exceptions.BadRequest as e:
+            if len(items) == 1:
+                items[0][2].set_exception(e)
+                return
+            # Some input was rejected: split to isolate it. The halves run as
+            # separate tasks and keep the attempt count.
+            middle = len(items) // 2
+            self._executor.submit(self._embed_batch, task_type, items[:middle], attempt)
+            self._executor.submit(self._embed_batch, task_type, items[middle:], attempt)
+        except Exception as e:
+            if attempt >= self.max_attempts:
+                for _, _, future in items:
+                    future.set_exception(e)
+                return
+            # Transient: retry the whole batch later without holding a worker thread
+            delay = 0.2 * 2 ** attempt
+            Timer(delay, self._executor.submit, args=(self._embed_batch, task_type, items, attempt + 1)).start()
+
+
+_batchers = {}
+_batchers_lock = Lock()
+
+
+def get_batcher(model="models/embedding-001"):
+    with _batchers_lock:
+        if model not in _batchers:
+            _batchers[model] = EmbeddingBatcher(model=model)
+        return _batchers[model]
+
+
+def get_embedding(text, model="models/embedding-001", task_type="RETRIEVAL_DOCUMENT"):
     """
     Generates embeddings for the given text using a Google Gemini model.
+    Use task_type="RETRIEVAL_QUERY" when embedding search queries.
     """
     try:
-        # Use the Gemini embedding model
-        result = genai.embed_content(
-            model=model,
-            content=text,
-            task_type="RETRIEVAL_DOCUMENT" # Use "retrieval_query" for queries
-        )
-        return result['embedding']
+        return get_batcher(model).submit(text, task_type).result(timeout=EMBED_TIMEOUT_SECONDS)
     except Exception as e:
         print(f"Error generating Gemini embedding: {e}")
         return None
@@ -31,4 +130,4 @@ if __name__ == "__main__":
     embedding = get_embedding(sample_text)
     if embedding:
         print(f"Embedding generated successfully. Dimension: {len(embedding)}")
-        # print(embedding) # Uncomment to see the full vector
\ No newline at end of file
+        # print(embedding) # Uncomment to see the full vector
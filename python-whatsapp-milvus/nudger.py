@@ -0,0 +1,108 @@
+import heapq
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Condition, Thread
+
+NUDGE_AFTER_SECONDS = int(os.getenv("NUDGE_AFTER_SECONDS", 24 * 3600))
+NUDGE_BATCH_SIZE = int(os.getenv("NUDGE_BATCH_SIZE", 100))
+NUDGE_CONCURRENCY = int(os.getenv("NUDGE_CONCURRENCY", 8))
+NUDGE_MESSAGE = "Haven't seen you in a while, where have you been?"
+
+
+class InactivityNudger:
+    """
+    Sends a nudge to users who have been inactive for idle_seconds.
+
+    Deadlines live in a min-heap, so recording activity costs O(log n) and
+    the scheduler thread sleeps exactly until the earliest deadline. A
+    user's older heap entries are skipped lazily when they reach the top.
+    Before sending, the session store is checked and updated atomically.
+    This means a user who was active on another worker is rescheduled
+    instead of nudged, and two workers never nudge the same user. A nudge
+    is recorded as "nudged_at", not as activity, so each user is nudged
+    at most once per stretch of inactivity and idle sessions still expire.
+    """
+
+    def __init__(self, sessions, send, idle_seconds=NUDGE_AFTER_SECONDS, batch_size=NUDGE_BATCH_SIZE,
+                 concurrency=NUDGE_CONCURRENCY, message=NUDGE_MESSAGE):
+        self.sessions = sessions
+        self.send = send
+        self.idle_seconds = idle_seconds
+        self.batch_size = batch_size
+        self.message = message
+        self._heap = []
+        self._deadlines = {}
+        self._cond = Condition()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="nudge")
+
+    def touch(self, number, last_active=None):
+        """Records activity for number and moves its deadline."""
+        deadline = (last_active or time.time()) + self.idle_seconds
+        with self._cond:
+            self._deadlines[number] = deadline
+            heapq.heappush(self._heap, (deadline, number))
+            if len(self._heap) > 2 * len(self._deadlines) + 1024:
+                self._compact()
+            # Only wake the scheduler if this is the new earliest deadline.
+            if self._heap[0][1] == number:
+                self._cond.notify()
+
+    def _compact(self):
+        self._heap = [(deadline, number) for number, deadline in self._deadlines.items()]
+        heapq.heapify(self._heap)
+
+    def start(self):
+        for number, last_active in self.sessions.last_active_times():
+            self.touch(number, last_active)
+        Thread(target=self._run, daemon=True, name="nudger").start()
+
+    def _pop_due(self):
+        due = []
+        now = time.time()
+        while self._heap and len(due) < self.batch_size:
+            deadline, number = self._heap[0]
+            if self._deadlines.get(number) != deadline:
+                heapq.heappop(self._heap)  # superseded by later activity
+                continue
+            if deadline > now:
+                break
+            heapq.heappop(self._heap)
+            del self._deadlines[number]
+            due.append(number)
+        return due
+
+    def _run(self):
+        while True:
+            with self._cond:
+                due = self._pop_due()
+                while not due:
+                    timeout = self._heap[0][0] - time.time() if self._heap else None
+                    self._cond.wait(timeout)
+                    due = self._pop_due()
+            for number in due:
+                self._executor.submit(self._nudge, number)
+
+    def _nudge(self, number):
+        claimed = []
+
+        def claim(session):
+            now = time.time()
+            idle = now - session["last_active"] >= self.idle_seconds
+            if idle and session.get("nudged_at", 0) < session["last_active"]:
+                session["nudged_at"] = now
+                claimed.append(True)
+            return session
+
+        try:
+            if self.sessions.get(number) is None:
+                return  # session expired; stop tracking this user
+            session = self.sessions.update(number, claim)
+            if claimed:
+                self.send(number, self.message)
+            elif session.get("nudged_at", 0) < session["last_active"]:
+                # Active on another worker since; wait out the new deadline.
+                self.touch(number, session["last_active"])
+            # Otherwise already nudged: the next message from the user reschedules.
+        except Exception as e:
+            print(f"Error nudging {number}: {e}")
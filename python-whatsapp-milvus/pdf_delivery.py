@@ -0,0 +1,125 @@
+import hashlib
+import hmac
+import os
+import queue
+import tempfile
+import time
+from threading import Thread
+
+PDF_STORE_DIR = os.getenv("PDF_STORE_DIR", "pdf_store")
+PDF_URL_TTL_SECONDS = int(os.getenv("PDF_URL_TTL_SECONDS", 3600))
+PDF_RETENTION_SECONDS = int(os.getenv("PDF_RETENTION_SECONDS", 24 * 3600))
+PDF_DELIVERY_WORKERS = int(os.getenv("PDF_DELIVERY_WORKERS", 4))
+PDF_DELIVERY_ATTEMPTS = 3
+
+
+class PdfStore:
+    """
+    Content-addressed PDF storage. Files are named by the SHA-256 of their
+    bytes, so re-sending the same invoice reuses one file. Links to them are
+    HMAC-signed and expire. Files older than retention_seconds are removed
+    by sweep(), which save() runs at most every ten minutes.
+    """
+
+    def __init__(self, secret, root=PDF_STORE_DIR, url_ttl_seconds=PDF_URL_TTL_SECONDS,
+                 retention_seconds=PDF_RETENTION_SECONDS):
+        if not secret:
+            raise ValueError("A signing secret is required for PDF links.")
+        self.secret = secret.encode("utf-8") if isinstance(secret, str) else secret
+        self.root = os.path.abspath(root)
+        self.url_ttl_seconds = url_ttl_seconds
+        self.retention_seconds = retention_seconds
+        self._last_sweep = 0
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, digest):
+        return os.path.join(self.root, f"{digest}.pdf")
+
+    def save(self, content):
+        """
+        Writes the PDF durably and returns its digest. When this returns,
+        the file is fsynced and visible under its final name.
+        """
+        if time.time() - self._last_sweep > 600:
+            self._last_sweep = time.time()
+            self.sweep()
+
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            os.utime(path)  # restart the retention clock
+            return digest
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as pdf_file:
+                pdf_file.write(content)
+                pdf_file.flush()
+                os.fsync(pdf_file.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        dir_fd = os.open(self.root, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        return digest
+
+    def sign(self, digest, expires=None):
+        """Returns (expires, signature) for a link to digest."""
+        expires = int(expires or time.time() + self.url_ttl_seconds)
+        message = f"{digest}:{expires}".encode("utf-8")
+        return expires, hmac.new(self.secret, message, hashlib.sha256).hexdigest()
+
+    def verify(self, digest, expires, signature):
+        try:
+            expires = int(expires)
+        except (TypeError, ValueError):
+            return False
+        if expires < time.time():
+            return False
+        return hmac.compare_digest(self.sign(digest, expires)[1], signature or "")
+
+    def sweep(self):
+        cutoff = time.time() - self.retention_seconds
+        for entry in os.scandir(self.root):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+class DeliveryQueue:
+    """
+    Sends invoice media messages from a small pool of worker threads.
+    Jobs are enqueued only after the PDF is durably stored, so they go out
+    immediately. Failed sends are retried with backoff.
+    """
+
+    def __init__(self, send, workers=PDF_DELIVERY_WORKERS, attempts=PDF_DELIVERY_ATTEMPTS):
+        self.send = send
+        self.attempts = attempts
+        self._queue = queue.Queue()
+        for index in range(workers):
+            Thread(target=self._run, daemon=True, name=f"pdf-delivery-{index}").start()
+
+    def enqueue(self, to_number, media_url):
+        self._queue.put((to_number, media_url))
+
+    def _run(self):
+        while True:
+            to_number, media_url = self._queue.get()
+            for attempt in range(self.attempts):
+                try:
+                    self.send(to_number, media_url)
+                    break
+                except Exception as e:
+                    print(f"Error delivering invoice to {to_number} (attempt {attempt + 1}): {e}")
+                    if attempt + 1 < self.attempts:
+                        time.sleep(2 ** attempt)
+            self._queue.task_done()
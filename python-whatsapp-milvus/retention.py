@@ -0,0 +1,73 @@
+from pymilvus import Collection, connections
+import os
+import sys
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 0 keeps messages forever
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", 0))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", 1000))
+RETENTION_INTERVAL_SECONDS = int(os.getenv("RETENTION_INTERVAL_SECONDS", 6 * 3600))
+
+
+def purge_expired(collection, retention_days=RETENTION_DAYS, batch_size=RETENTION_BATCH_SIZE):
+    """
+    Deletes messages older than retention_days in batches of batch_size
+    primary keys, then triggers compaction so the deleted rows are
+    physically dropped. Returns the number of rows deleted.
+    """
+    cutoff_ms = int((time.time() - retention_days * 24 * 3600) * 1000)
+    expr = f"timestamp < {cutoff_ms}"
+    deleted = 0
+    while True:
+        rows = collection.query(expr=expr, output_fields=["id"], limit=batch_size, consistency_level="Strong")
+        if not rows:
+            break
+        ids = [row["id"] for row in rows]
+        collection.delete(f"id in {ids}")
+        deleted += len(ids)
+
+    if deleted:
+        collection.compact()
+        print(f"Deleted {deleted} messages older than {retention_days} days; compaction triggered.")
+    return deleted
+
+
+class RetentionJob:
+    """
+    Runs purge_expired every interval_seconds. Run exactly one per
+    deployment (python retention.py), not one per server worker.
+    """
+
+    def __init__(self, collection, retention_days=RETENTION_DAYS, interval_seconds=RETENTION_INTERVAL_SECONDS):
+        self.collection = collection
+        self.retention_days = retention_days
+        self.interval_seconds = interval_seconds
+
+    def run(self):
+        while True:
+            try:
+                purge_expired(self.collection, self.retention_days)
+            except Exception as e:
+                print(f"Error purging expired messages: {e}")
+            time.sleep(self.interval_seconds)
+
+
+if __name__ == "__main__":
+    # python retention.py runs the job in the foreground; --once is for cron
+    if RETENTION_DAYS <= 0:
+        print("RETENTION_DAYS is not set; nothing to purge.")
+    else:
+        connections.connect(
+            alias="default",
+            host=os.getenv("MILVUS_HOST", "localhost"),
+            port=os.getenv("MILVUS_PORT", "19530")
+        )
+        collection = Collection(name="whatsapp_collection")
+        collection.load()
+        if "--once" in sys.argv[1:]:
+            purge_expired(collection)
+        else:
+            RetentionJob(collection).run()
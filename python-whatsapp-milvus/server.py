@@ -1,18 +1,19 @@
-from flask import Flask, request, Response, url_for
+from flask import Flask, request, Response, url_for, send_file, abort
 from twilio.twiml.messaging_response import MessagingResponse
 from pymilvus import Collection, connections
 import os
 from dotenv import load_dotenv
 from embedding import get_embedding # <-- This now uses Gemini
 import requests
-from datetime import datetime, timezone
-from uuid import uuid4
 from twilio.rest import Client
-from threading import Thread
+import re
 import time
 import google.generativeai as genai # <-- Import Google's SDK
-from pydub import AudioSegment
-from requests.auth import HTTPBasicAuth
+from transcription import transcribe_media
+from session_store import create_session_store
+from nudger import InactivityNudger
+from pdf_delivery import PdfStore, DeliveryQueue
+from conversation_memory import ConversationMemory, now_ms
 
 load_dotenv()
 
@@ -39,58 +40,28 @@ genai.configure(api_key=GOOGLE_API_KEY)
 
 # --- Milvus Collection ---
 collection = Collection(name="whatsapp_collection")
+memory = ConversationMemory(collection)
 
-sessions = {}
-last_active = {}
+sessions = create_session_store()
+twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
 
-def transcribe_audio_gemini(file_path):
-    """
-    Transcribes an audio file using a Gemini model that supports audio input.
-    """
-    try:
-        # Use a model that can handle audio, like Gemini 1.5 Pro
-        model = genai.GenerativeModel('models/gemini-1.5-pro-latest')
-        
-        # Upload the audio file to the Gemini API
-        audio_file = genai.upload_file(path=file_path)
-        
-        # Ask the model to transcribe the audio
-        response = model.generate_content(["Please transcribe this audio.", audio_file])
-        
-        # Clean up the uploaded file
-        genai.delete_file(audio_file.name)
-        
-        return response.text
-    except Exception as e:
-        print(f"Error transcribing audio with Gemini: {e}")
-        raise e
+def touch(session):
+    session["last_active"] = time.time()
+    return session
 
-# --- (Other functions like send_whatsapp_message, reminder_thread, etc. remain the same) ---
 def send_whatsapp_message(to_number, message):
-    client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-    message = client.messages.create(
+    message = twilio_client.messages.create(
         from_='whatsapp:+14155238886',
         to=to_number,
         body=message
     )
     print("Reminder sent to {} with message {}".format(to_number, message))
 
-def reminder_thread():
-    while True:
-        now = datetime.now(timezone.utc)
-        for number, last_time in list(last_active.items()):
-            if (now - last_time).total_seconds() > 24 * 3600:
-                send_whatsapp_message(number, "Haven't seen you in a while, where have you been?")
-                last_active[number] = now
-        time.sleep(3600)
-
-thread = Thread(target=reminder_thread, daemon=True)
-thread.start()
-
-def process_invoice_async(to_number, media_url):
-    time.sleep(20)
-    client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-    message = client.messages.create(
+nudger = InactivityNudger(sessions, send_whatsapp_message)
+nudger.start()
+
+def send_invoice_message(to_number, media_url):
+    message = twilio_client.messages.create(
         from_='whatsapp:+14155238886',
         to=to_number,
         body="Your invoice has been generated. You can download it here:",
@@ -98,12 +69,22 @@ def process_invoice_async(to_number, media_url):
     )
     print(f"Message sent to {to_number} with SID: {message.sid}")
 
-def convert_to_supported_format(input_path, output_path, format="wav"):
-    try:
-        AudioSegment.from_file(input_path).export(output_path, format=format)
-    except Exception as e:
-        print(f"Error converting audio file: {e}")
-        raise e
+# --- Invoice PDFs ---
+pdf_store = PdfStore(os.getenv("PDF_URL_SECRET") or TWILIO_AUTH_TOKEN)
+invoice_deliveries = DeliveryQueue(send_invoice_message)
+
+@app.route("/invoices/<digest>.pdf")
+def serve_invoice_pdf(digest):
+    if not re.fullmatch(r"[0-9a-f]{64}", digest):
+        abort(404)
+    if not pdf_store.verify(digest, request.args.get("expires"), request.args.get("signature")):
+        abort(403)
+    path = pdf_store.path_for(digest)
+    if not os.path.exists(path):
+        abort(404)
+    # conditional=True answers Range and If-None-Match requests
+    return send_file(path, mimetype="application/pdf", conditional=True, etag=digest,
+                     max_age=pdf_store.url_ttl_seconds)
 
 @app.route("/webhook", methods=['POST'])
 def webhook():
@@ -111,50 +92,58 @@ def webhook():
     body = request.form.get('Body')
     audio_url = request.form.get('MediaUrl0')
     media_content_type = request.form.get('MediaContentType0')
-    timestamp = datetime.now(timezone.utc).isoformat()
-    last_active[from_number] = datetime.now(timezone.utc)
-    
+    timestamp = now_ms()
+
+    def record_activity(fn=touch):
+        # Exactly one session write per inbound message; it also moves the nudge deadline
+        session = sessions.update(from_number, fn)
+        nudger.touch(from_number, session["last_active"])
+        return session
+
     try:
-        if audio_url and "audio" in media_content_type:
-            input_audio_path = "temp_audio.ogg"
-            converted_audio_path = "temp_audio.wav"
-            
-            audio_response = requests.get(audio_url, auth=HTTPBasicAuth(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN))
-            with open(input_audio_path, "wb") as audio_file:
-                audio_file.write(audio_response.content)
-            
-            convert_to_supported_format(input_audio_path, converted_audio_path)
-            # --- Use the new Gemini transcription function ---
-            body = transcribe_audio_gemini(converted_audio_path)
+        if audio_url and media_content_type and "audio" in media_content_type:
+            body = transcribe_media(audio_url, media_content_type, TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
 
         if not body: # Ensure body is not empty after potential transcription
+            record_activity()
             resp = MessagingResponse()
             resp.message("Sorry, I couldn't understand the message.")
             return Response(str(resp), mimetype='application/xml')
 
         embedding = get_embedding(body) # This now calls the Gemini embedding function
         if not embedding:
+            record_activity()
             resp = MessagingResponse()
             resp.message("Sorry, something went wrong while processing your message.")
             return Response(str(resp), mimetype='application/xml')
-            
-        entities = [[from_number], [body], [timestamp], [embedding]]
-        collection.insert(entities)
-        collection.flush()
+
+        # Search before inserting so the current message doesn't match itself.
+        # The document embedding doubles as the query to save an API call.
+        try:
+            memory_context = memory.recent_context(from_number, embedding)
+        except Exception as e:
+            print(f"Error searching conversation memory: {e}")
+            memory_context = []
+
+        memory.add(from_number, body, timestamp, embedding)
 
     except Exception as e:
         print(f"Error processing message or inserting into Milvus: {e}")
+        record_activity()
         resp = MessagingResponse()
         resp.message("Sorry, there was an error processing your message.")
         return Response(str(resp), mimetype='application/xml')
 
-    if from_number not in sessions:
-        sessions[from_number] = {"messages": []}
-    sessions[from_number]["messages"].append({"role": "user", "content": body})
+    def append_user_message(session):
+        session["messages"].append({"role": "user", "content": body})
+        return touch(session)
+
+    session = record_activity(append_user_message)
 
     state_payload = {
-        "messages": sessions[from_number]["messages"],
-        "conversation_state": sessions[from_number].get("conversation_state", {})
+        "messages": session["messages"],
+        "conversation_state": session.get("conversation_state", {}),
+        "memory": memory_context
     }
     headers = {"phone-number": from_number}
 
@@ -163,25 +152,24 @@ def webhook():
         chat_response.raise_for_status()
         
         if "application/pdf" in chat_response.headers.get("Content-Type", ""):
-            pdf_filename = f"invoice_{uuid4().hex}.pdf"
-            pdf_path = os.path.join("static", pdf_filename)
-            os.makedirs("static", exist_ok=True)
-            with open(pdf_path, 'wb') as pdf_file:
-                pdf_file.write(chat_response.content)
-            
-            media_url = url_for('static', filename=pdf_filename, _external=True)
+            digest = pdf_store.save(chat_response.content)
+            expires, signature = pdf_store.sign(digest)
+            media_url = url_for('serve_invoice_pdf', digest=digest, expires=expires, signature=signature,
+                                _external=True)
             resp = MessagingResponse()
             resp.message("Processing request...")
-            thread = Thread(target=process_invoice_async, args=(from_number, media_url))
-            thread.start()
+            invoice_deliveries.enqueue(from_number, media_url)
             return Response(str(resp), mimetype='application/xml')
 
         if chat_response.headers.get("Content-Type") == "application/json":
             chat_data = chat_response.json()
-            sessions[from_number]["messages"] = chat_data.get("messages", sessions[from_number]["messages"])
-            sessions[from_number]["conversation_state"] = chat_data.get("conversation_state", {})
-            
-            messages = sessions[from_number]["messages"]
+
+            def store_reply(session):
+                session["messages"] = chat_data.get("messages", session["messages"])
+                session["conversation_state"] = chat_data.get("conversation_state", {})
+                return session
+
+            messages = sessions.update(from_number, store_reply)["messages"]
             bot_response = "I'm sorry, I don't understand."
             for msg in reversed(messages):
                 if msg.get("role") == "assistant":
@@ -0,0 +1,196 @@
+import copy
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock, local
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.sqlite3")
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", 7 * 24 * 3600))
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", 10000))
+MAX_SESSION_MESSAGES = int(os.getenv("MAX_SESSION_MESSAGES", 50))
+
+
+def new_session():
+    return {"messages": [], "conversation_state": {}, "last_active": time.time()}
+
+
+def _trim(session, max_messages):
+    # Only the most recent messages are needed to drive the conversation.
+    if len(session["messages"]) > max_messages:
+        session["messages"] = session["messages"][-max_messages:]
+    return session
+
+
+class SessionStore:
+    """
+    Per-phone-number conversation state.
+
+    Sessions are plain dicts with "messages", "conversation_state" and
+    "last_active" (epoch seconds). Callers never mutate a stored session
+    directly; they pass a function to update(), which runs it as an atomic
+    read-modify-write for that phone number.
+    """
+
+    def get(self, phone_number):
+        raise NotImplementedError
+
+    def update(self, phone_number, fn):
+        """
+        Applies fn to a copy of the session (or a new one) and stores the
+        result. Returns the stored session.
+        """
+        raise NotImplementedError
+
+    def delete(self, phone_number):
+        raise NotImplementedError
+
+    def last_active_times(self):
+        """
+        Returns (phone_number, last_active) pairs for every live session.
+        """
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """
+    In-process store with LRU eviction past max_sessions, expiry after
+    ttl_seconds of inactivity and a cap on messages per session.
+    """
+
+    def __init__(self, max_sessions=MAX_SESSIONS, ttl_seconds=SESSION_TTL_SECONDS,
+                 max_messages=MAX_SESSION_MESSAGES):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self._sessions = OrderedDict()
+        self._lock = Lock()
+
+    def _expire(self, now):
+        # Entries are kept in last_active order, so expired ones sit at the front.
+        while self._sessions:
+            phone_number, session = next(iter(self._sessions.items()))
+            if now - session["last_active"] <= self.ttl_seconds and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+
+    def get(self, phone_number):
+        with self._lock:
+            session = self._sessions.get(phone_number)
+            if session is None or time.time() - session["last_active"] > self.ttl_seconds:
+                return None
+            return copy.deepcopy(session)
+
+    def update(self, phone_number, fn):
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            existing = self._sessions.get(phone_number)
+            session = copy.deepcopy(existing) or new_session()
+            session = _trim(fn(session), self.max_messages)
+            self._sessions[phone_number] = session
+            # Only activity counts for LRU; bookkeeping writes like a nudge keep their place.
+            if existing is None or session["last_active"] != existing["last_active"]:
+                self._sessions.move_to_end(phone_number)
+            self._expire(now)
+            return copy.deepcopy(session)
+
+    def delete(self, phone_number):
+        with self._lock:
+            self._sessions.pop(phone_number, None)
+
+    def last_active_times(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            return [(number, session["last_active"]) for number, session in self._sessions.items()
+                    if session["last_active"] >= cutoff]
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    File-backed store shared by every server process on the host.
+    update() runs inside a BEGIN IMMEDIATE transaction, which serialises
+    concurrent writers across processes.
+    """
+
+    def __init__(self, path=SESSION_DB_PATH, max_sessions=MAX_SESSIONS, ttl_seconds=SESSION_TTL_SECONDS,
+                 max_messages=MAX_SESSION_MESSAGES):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self._local = local()
+        self._writes = 0
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "phone_number TEXT PRIMARY KEY, data TEXT NOT NULL, last_active REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_active ON sessions (last_active)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly below.
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, phone_number):
+        row = self._connect().execute(
+            "SELECT data FROM sessions WHERE phone_number = ? AND last_active >= ?",
+            (phone_number, time.time() - self.ttl_seconds),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, phone_number, fn):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Expired rows count as missing, like in get(), so they aren't revived.
+            row = conn.execute(
+                "SELECT data FROM sessions WHERE phone_number = ? AND last_active >= ?",
+                (phone_number, time.time() - self.ttl_seconds),
+            ).fetchone()
+            session = json.loads(row[0]) if row else new_session()
+            session = _trim(fn(session), self.max_messages)
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (phone_number, data, last_active) VALUES (?, ?, ?)",
+                (phone_number, json.dumps(session), session["last_active"]),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._expire(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return session
+
+    def _expire(self, conn):
+        conn.execute("DELETE FROM sessions WHERE last_active < ?", (time.time() - self.ttl_seconds,))
+        conn.execute(
+            "DELETE FROM sessions WHERE phone_number IN ("
+            "SELECT phone_number FROM sessions ORDER BY last_active DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,),
+        )
+
+    def delete(self, phone_number):
+        self._connect().execute("DELETE FROM sessions WHERE phone_number = ?", (phone_number,))
+
+    def last_active_times(self):
+        return self._connect().execute(
+            "SELECT phone_number, last_active FROM sessions WHERE last_active >= ?",
+            (time.time() - self.ttl_seconds,),
+        ).fetchall()
+
+
+def create_session_store(backend=SESSION_BACKEND):
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    raise ValueError(f"Unknown SESSION_BACKEND '{backend}'. Use 'memory' or 'sqlite'.")
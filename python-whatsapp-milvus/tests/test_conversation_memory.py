@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+import conversation_memory
+from conversation_memory import ConversationMemory
+
+
+class FakeCollection:
+    def __init__(self, index_type):
+        self.index_type = index_type
+        self.searches = []
+
+    @property
+    def indexes(self):
+        return [SimpleNamespace(field_name="from_number", params={"index_type": "INVERTED"}),
+                SimpleNamespace(field_name="embedding", params={"index_type": self.index_type})]
+
+    def load(self):
+        pass
+
+    def search(self, **kwargs):
+        self.searches.append(kwargs)
+        hit = SimpleNamespace(entity={"body": "hi", "timestamp": 1}, distance=0.5)
+        return [[hit]]
+
+
+def test_ivf_index_is_searched_with_nprobe():
+    memory = ConversationMemory(FakeCollection("IVF_SQ8"))
+    memory.search("+1", [0.0], k=5)
+    assert memory.collection.searches[0]["param"]["params"] == {"nprobe": conversation_memory.MEMORY_NPROBE}
+
+
+def test_hnsw_index_is_searched_with_ef_at_least_k():
+    memory = ConversationMemory(FakeCollection("HNSW"))
+    memory.search("+1", [0.0], k=500)
+    assert memory.collection.searches[0]["param"]["params"] == {"ef": 500}
+
+
+def test_index_switch_is_picked_up_after_refresh(monkeypatch):
+    monkeypatch.setattr(conversation_memory, "MEMORY_INDEX_REFRESH_SECONDS", 0)
+    memory = ConversationMemory(FakeCollection("IVF_FLAT"))
+    memory.search("+1", [0.0])
+    memory.collection.index_type = "HNSW"
+    memory.search("+1", [0.0])
+    assert "ef" in memory.collection.searches[1]["param"]["params"]
+
+
+def test_search_filters_by_user_and_time():
+    memory = ConversationMemory(FakeCollection("IVF_FLAT"))
+    results = memory.search('+1"', [0.0], since=10, until=20)
+    assert memory.collection.searches[0]["expr"] == 'from_number == "+1\\"" and timestamp >= 10 and timestamp < 20'
+    assert results == [{"content": "hi", "timestamp": 1, "distance": 0.5}]
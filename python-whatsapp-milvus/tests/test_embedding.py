@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("google.generativeai")
+google_exceptions = pytest.importorskip("google.api_core.exceptions")
+
+
+@pytest.fixture
+def embedding(monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    import embedding
+    return embedding
+
+
+class FakeEmbedContent:
+    """Stands in for genai.embed_content; fail(texts) may raise instead."""
+
+    def __init__(self, fail=lambda texts: None):
+        self.fail = fail
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, model, content, task_type):
+        with self._lock:
+            self.calls.append(list(content))
+        self.fail(content)
+        return {"embedding": [[float(len(text))] for text in content]}
+
+
+def submit_all(batcher, texts):
+    return [batcher.submit(text) for text in texts]
+
+
+def test_concurrent_requests_share_one_call(embedding, monkeypatch):
+    fake = FakeEmbedContent()
+    monkeypatch.setattr(embedding.genai, "embed_content", fake)
+    batcher = embedding.EmbeddingBatcher(max_wait_ms=50)
+    futures = submit_all(batcher, ["a", "bb", "ccc"])
+    assert [f.result(timeout=2) for f in futures] == [[1.0], [2.0], [3.0]]
+    assert fake.calls == [["a", "bb", "ccc"]]
+
+
+def test_transient_error_retries_whole_batch(embedding, monkeypatch):
+    failures = [google_exceptions.ResourceExhausted("429")]
+
+    def fail(texts):
+        if failures:
+            raise failures.pop()
+
+    fake = FakeEmbedContent(fail)
+    monkeypatch.setattr(embedding.genai, "embed_content", fake)
+    batcher = embedding.EmbeddingBatcher(max_wait_ms=50)
+    futures = submit_all(batcher, ["a", "bb", "ccc", "dddd"])
+    assert [f.result(timeout=5) for f in futures] == [[1.0], [2.0], [3.0], [4.0]]
+    # Retried as one batch, not bisected
+    assert fake.calls == [["a", "bb", "ccc", "dddd"]] * 2
+
+
+def test_persistent_transient_error_fails_every_item_after_max_attempts(embedding, monkeypatch):
+    def fail(texts):
+        raise google_exceptions.ServiceUnavailable("503")
+
+    fake = FakeEmbedContent(fail)
+    monkeypatch.setattr(embedding.genai, "embed_content", fake)
+    batcher = embedding.EmbeddingBatcher(max_wait_ms=50, max_attempts=2)
+    futures = submit_all(batcher, [str(i) for i in range(100)])
+    for future in futures:
+        with pytest.raises(google_exceptions.ServiceUnavailable):
+            future.result(timeout=5)
+    assert len(fake.calls) == 2
+
+
+def test_bad_input_is_isolated(embedding, monkeypatch):
+    def fail(texts):
+        if "bad" in texts:
+            raise google_exceptions.InvalidArgument("400")
+
+    fake = FakeEmbedContent(fail)
+    monkeypatch.setattr(embedding.genai, "embed_content", fake)
+    batcher = embedding.EmbeddingBatcher(max_wait_ms=50)
+    futures = submit_all(batcher, ["a", "bb", "bad", "dddd"])
+    with pytest.raises(google_exceptions.InvalidArgument):
+        futures[2].result(timeout=2)
+    assert [futures[i].result(timeout=2) for i in (0, 1, 3)] == [[1.0], [2.0], [4.0]]
+
+
+def test_get_embedding_gives_up_after_timeout(embedding, monkeypatch):
+    monkeypatch.setattr(embedding.genai, "embed_content", FakeEmbedContent(lambda texts: time.sleep(1)))
+    monkeypatch.setattr(embedding, "EMBED_TIMEOUT_SECONDS", 0.1)
+    monkeypatch.setattr(embedding, "_batchers", {})
+    started = time.monotonic()
+    assert embedding.get_embedding("slow") is None
+    assert time.monotonic() - started < 0.9
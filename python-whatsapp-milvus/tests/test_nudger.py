@@ -0,0 +1,96 @@
+import time
+
+from nudger import InactivityNudger
+from session_store import MemorySessionStore
+
+
+def make_nudger(idle_seconds=10, batch_size=100):
+    sessions = MemorySessionStore(ttl_seconds=3600)
+    sent = []
+    nudger = InactivityNudger(sessions, lambda number, message: sent.append(number),
+                              idle_seconds=idle_seconds, batch_size=batch_size, concurrency=1)
+    return nudger, sessions, sent
+
+
+def set_active(sessions, number, last_active):
+    def fn(session):
+        session["last_active"] = last_active
+        return session
+    return sessions.update(number, fn)
+
+
+def test_pop_due_returns_only_expired_deadlines_in_order():
+    nudger, _, _ = make_nudger(idle_seconds=10)
+    now = time.time()
+    nudger.touch("+2", now - 15)
+    nudger.touch("+1", now - 20)
+    nudger.touch("+3", now)
+    assert nudger._pop_due() == ["+1", "+2"]
+    assert nudger._pop_due() == []
+
+
+def test_pop_due_skips_superseded_entries():
+    nudger, _, _ = make_nudger(idle_seconds=10)
+    now = time.time()
+    nudger.touch("+1", now - 20)
+    nudger.touch("+1", now)  # active again: the old heap entry is stale
+    assert nudger._pop_due() == []
+    assert nudger._deadlines == {"+1": now + 10}
+
+
+def test_pop_due_respects_batch_size():
+    nudger, _, _ = make_nudger(idle_seconds=10, batch_size=2)
+    for i in range(5):
+        nudger.touch(f"+{i}", time.time() - 20)
+    assert len(nudger._pop_due()) == 2
+    assert len(nudger._pop_due()) == 2
+    assert len(nudger._pop_due()) == 1
+
+
+def test_compaction_drops_stale_entries():
+    nudger, _, _ = make_nudger(idle_seconds=10)
+    for i in range(3000):
+        nudger.touch("+1", time.time() + i)
+    assert len(nudger._deadlines) == 1
+    assert len(nudger._heap) <= 2 * len(nudger._deadlines) + 1024
+
+
+def test_idle_user_is_nudged_once():
+    nudger, sessions, sent = make_nudger(idle_seconds=10)
+    last_active = set_active(sessions, "+1", time.time() - 20)["last_active"]
+    nudger._nudge("+1")
+    assert sent == ["+1"]
+    session = sessions.get("+1")
+    # A nudge is not activity
+    assert session["last_active"] == last_active
+    assert session["nudged_at"] > last_active
+    assert "+1" not in nudger._deadlines
+
+    nudger._nudge("+1")
+    assert sent == ["+1"]
+
+
+def test_user_is_nudged_again_after_writing():
+    nudger, sessions, sent = make_nudger(idle_seconds=0.05)
+    set_active(sessions, "+1", time.time() - 1)
+    nudger._nudge("+1")
+    time.sleep(0.01)
+    set_active(sessions, "+1", time.time())
+    time.sleep(0.06)
+    nudger._nudge("+1")
+    assert sent == ["+1", "+1"]
+
+
+def test_user_active_elsewhere_is_rescheduled_not_nudged():
+    nudger, sessions, sent = make_nudger(idle_seconds=10)
+    last_active = set_active(sessions, "+1", time.time())["last_active"]
+    nudger._nudge("+1")
+    assert sent == []
+    assert nudger._deadlines["+1"] == last_active + 10
+
+
+def test_expired_session_is_dropped():
+    nudger, _, sent = make_nudger(idle_seconds=10)
+    nudger._nudge("+unknown")
+    assert sent == []
+    assert nudger._deadlines == {}
@@ -0,0 +1,106 @@
+import json
+import time
+
+import pytest
+
+from session_store import MemorySessionStore, SQLiteSessionStore, create_session_store
+
+
+def touch(session):
+    session["last_active"] = time.time()
+    return session
+
+
+def append(message):
+    def fn(session):
+        session["messages"].append(message)
+        return touch(session)
+    return fn
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionStore(max_sessions=3, ttl_seconds=60, max_messages=2)
+    return SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"), max_sessions=3, ttl_seconds=60, max_messages=2)
+
+
+def test_update_creates_and_returns_session(store):
+    session = store.update("+1", append("hi"))
+    assert session["messages"] == ["hi"]
+    assert store.get("+1")["messages"] == ["hi"]
+
+
+def test_messages_are_trimmed(store):
+    for message in ("a", "b", "c"):
+        store.update("+1", append(message))
+    assert store.get("+1")["messages"] == ["b", "c"]
+
+
+def test_returned_session_is_a_copy(store):
+    session = store.update("+1", append("hi"))
+    session["messages"].append("mutated")
+    assert store.get("+1")["messages"] == ["hi"]
+
+
+def test_failed_update_keeps_previous_session(store):
+    store.update("+1", append("hi"))
+
+    def boom(session):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        store.update("+1", boom)
+    assert store.get("+1")["messages"] == ["hi"]
+
+
+def test_expired_session_is_not_returned(store):
+    store.update("+1", append("hi"))
+    store.ttl_seconds = 0.01
+    time.sleep(0.02)
+    assert store.get("+1") is None
+    assert store.last_active_times() == []
+
+
+def test_sqlite_update_ignores_expired_row(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"), ttl_seconds=60)
+    stale = {"messages": ["old"], "conversation_state": {"step": 3}, "last_active": 0}
+    store._connect().execute("INSERT INTO sessions VALUES (?, ?, ?)", ("+1", json.dumps(stale), 0))
+    session = store.update("+1", touch)
+    assert session["messages"] == []
+    assert session["conversation_state"] == {}
+
+
+def test_memory_store_evicts_least_recently_active():
+    store = MemorySessionStore(max_sessions=2, ttl_seconds=60)
+    for number in ("+1", "+2", "+1", "+3"):
+        store.update(number, touch)
+    assert store.get("+2") is None
+    assert store.get("+1") is not None and store.get("+3") is not None
+
+
+def test_memory_store_bookkeeping_write_keeps_lru_position():
+    store = MemorySessionStore(max_sessions=2, ttl_seconds=60)
+    store.update("+1", touch)
+    store.update("+2", touch)
+
+    def mark_nudged(session):
+        session["nudged_at"] = time.time()
+        return session
+
+    # Not activity: +1 stays the least recently active and is evicted first
+    store.update("+1", mark_nudged)
+    store.update("+3", touch)
+    assert store.get("+1") is None
+    assert store.get("+2") is not None
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    SQLiteSessionStore(path).update("+1", append("hi"))
+    assert SQLiteSessionStore(path).get("+1")["messages"] == ["hi"]
+
+
+def test_create_session_store_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        create_session_store("redis")
@@ -0,0 +1,28 @@
+from transcription_cache import TranscriptionCache
+
+
+def test_get_by_url_after_put(tmp_path):
+    cache = TranscriptionCache(str(tmp_path / "cache.sqlite3"))
+    cache.put("digest", "hello", url="https://media/1")
+    assert cache.get_by_url("https://media/1") == "hello"
+    assert cache.get_by_url("https://media/unknown") is None
+
+
+def test_second_put_keeps_other_urls(tmp_path):
+    # Replacing the transcription row used to cascade and drop url mappings
+    cache = TranscriptionCache(str(tmp_path / "cache.sqlite3"))
+    cache.put("digest", "hello", url="https://media/1")
+    cache.put("digest", "hello", url="https://media/2")
+    assert cache.get_by_url("https://media/1") == "hello"
+    assert cache.get_by_url("https://media/2") == "hello"
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = TranscriptionCache(str(tmp_path / "cache.sqlite3"), max_bytes=10)
+    cache.put("old", "aaaaa", url="https://media/old")
+    cache.put("new", "bbbbb")
+    cache.get("new")
+    cache.put("newest", "ccccc")
+    assert cache.get("old") is None
+    assert cache.get_by_url("https://media/old") is None
+    assert cache.get("newest") == "ccccc"
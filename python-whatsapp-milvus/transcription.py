@@ -0,0 +1,150 @@
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+
+import google.generativeai as genai
+import requests
+from requests.auth import HTTPBasicAuth
+
+from transcription_cache import TranscriptionCache
+
+# Audio types Gemini accepts directly. Anything else is converted to WAV first.
+SUPPORTED_AUDIO_TYPES = {
+    "audio/wav": ".wav",
+    "audio/x-wav": ".wav",
+    "audio/mp3": ".mp3",
+    "audio/mpeg": ".mp3",
+    "audio/aiff": ".aiff",
+    "audio/aac": ".aac",
+    "audio/ogg": ".ogg",
+    "audio/flac": ".flac",
+}
+
+AUDIO_CONVERSION_WORKERS = int(os.getenv("AUDIO_CONVERSION_WORKERS", os.cpu_count() or 1))
+MAX_AUDIO_BYTES = int(os.getenv("MAX_AUDIO_BYTES", 16 * 1024 * 1024))  # WhatsApp's media limit
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_TIMEOUT = 30
+
+_pool = None
+_pool_lock = Lock()
+_cache = None
+_cache_lock = Lock()
+
+
+def _get_pool():
+    """
+    Returns the shared conversion pool, creating it on first use so that
+    forked server workers each get their own processes.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=AUDIO_CONVERSION_WORKERS)
+        return _pool
+
+
+def _get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TranscriptionCache()
+        return _cache
+
+
+def _convert_file(input_path, output_path, format):
+    # Runs inside a pool process; pydub shells out to ffmpeg.
+    from pydub import AudioSegment
+    AudioSegment.from_file(input_path).export(output_path, format=format)
+    return output_path
+
+
+def convert_to_supported_format(input_path, output_path, format="wav"):
+    """
+    Converts an audio file in the process pool and blocks until it is done.
+    """
+    try:
+        return _get_pool().submit(_convert_file, input_path, output_path, format).result()
+    except Exception as e:
+        print(f"Error converting audio file: {e}")
+        raise e
+
+
+def download_media(media_url, dest_path, auth=None):
+    """
+    Streams a media file to disk without holding it in memory and returns
+    the SHA-256 hex digest of its contents.
+    """
+    digest = hashlib.sha256()
+    with requests.get(media_url, auth=auth, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+        written = 0
+        with open(dest_path, "wb") as media_file:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                written += len(chunk)
+                if written > MAX_AUDIO_BYTES:
+                    raise ValueError(f"Media exceeds {MAX_AUDIO_BYTES} bytes")
+                digest.update(chunk)
+                media_file.write(chunk)
+    return digest.hexdigest()
+
+
+def transcribe_audio_gemini(file_path, mime_type=None):
+    """
+    Transcribes an audio file using a Gemini model that supports audio input.
+    """
+    try:
+        # Use a model that can handle audio, like Gemini 1.5 Pro
+        model = genai.GenerativeModel('models/gemini-1.5-pro-latest')
+
+        # Upload the audio file to the Gemini API
+        audio_file = genai.upload_file(path=file_path, mime_type=mime_type)
+
+        try:
+            # Ask the model to transcribe the audio
+            response = model.generate_content(["Please transcribe this audio.", audio_file])
+        finally:
+            # Clean up the uploaded file
+            genai.delete_file(audio_file.name)
+
+        return response.text
+    except Exception as e:
+        print(f"Error transcribing audio with Gemini: {e}")
+        raise e
+
+
+def transcribe_media(media_url, content_type, account_sid, auth_token):
+    """
+    Downloads a Twilio media attachment and returns its transcription.
+
+    Every call works in its own temporary directory, so concurrent voice
+    notes never share files. Formats Gemini already accepts are uploaded
+    as-is; others are converted to WAV in the process pool. Results are
+    cached by media URL and by content hash, so retried webhooks and
+    forwarded voice notes skip Gemini entirely.
+    """
+    cache = _get_cache()
+    cached = cache.get_by_url(media_url)
+    if cached is not None:
+        return cached
+
+    mime_type = (content_type or "").split(";")[0].strip().lower()
+    with tempfile.TemporaryDirectory(prefix="audio_") as workdir:
+        suffix = SUPPORTED_AUDIO_TYPES.get(mime_type, ".bin")
+        input_path = os.path.join(workdir, f"input{suffix}")
+        digest = download_media(media_url, input_path, auth=HTTPBasicAuth(account_sid, auth_token))
+
+        cached = cache.get(digest)
+        if cached is not None:
+            cache.add_url(media_url, digest)
+            return cached
+
+        if mime_type in SUPPORTED_AUDIO_TYPES:
+            text = transcribe_audio_gemini(input_path, mime_type=mime_type)
+        else:
+            converted_path = convert_to_supported_format(input_path, os.path.join(workdir, "converted.wav"))
+            text = transcribe_audio_gemini(converted_path, mime_type="audio/wav")
+
+    cache.put(digest, text, url=media_url)
+    return text
@@ -0,0 +1,94 @@
+import os
+import sqlite3
+import time
+from threading import local
+
+TRANSCRIPTION_CACHE_PATH = os.getenv("TRANSCRIPTION_CACHE_PATH", "transcription_cache.sqlite3")
+TRANSCRIPTION_CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPTION_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcriptions (
+    digest TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transcriptions_last_used ON transcriptions (last_used);
+CREATE TABLE IF NOT EXISTS media_urls (
+    url TEXT PRIMARY KEY,
+    digest TEXT NOT NULL REFERENCES transcriptions (digest) ON DELETE CASCADE
+);
+"""
+
+
+class TranscriptionCache:
+    """
+    Persistent transcription cache keyed by the SHA-256 of the audio bytes,
+    with a secondary index on the media URL so Twilio retries skip the
+    download too. Backed by SQLite in WAL mode, so every server process on
+    the host shares it. Least recently used entries are evicted once the
+    stored text exceeds max_bytes.
+    """
+
+    def __init__(self, path=TRANSCRIPTION_CACHE_PATH, max_bytes=TRANSCRIPTION_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def get_by_url(self, url):
+        with self._connect() as conn:
+            row = conn.execute("SELECT digest FROM media_urls WHERE url = ?", (url,)).fetchone()
+        return self.get(row[0]) if row else None
+
+    def get(self, digest):
+        with self._connect() as conn:
+            row = conn.execute("SELECT text FROM transcriptions WHERE digest = ?", (digest,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE transcriptions SET last_used = ? WHERE digest = ?", (time.time(), digest))
+        return row[0]
+
+    def add_url(self, url, digest):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO media_urls (url, digest) VALUES (?, ?)", (url, digest))
+
+    def put(self, digest, text, url=None):
+        size = len(text.encode("utf-8"))
+        with self._connect() as conn:
+            conn.execute(
+                # An upsert, not INSERT OR REPLACE: replacing the row would
+                # cascade and drop the other URLs mapped to this digest.
+                "INSERT INTO transcriptions (digest, text, size, last_used) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(digest) DO UPDATE SET text = excluded.text, size = excluded.size, "
+                "last_used = excluded.last_used",
+                (digest, text, size, time.time()),
+            )
+            if url:
+                conn.execute("INSERT OR REPLACE INTO media_urls (url, digest) VALUES (?, ?)", (url, digest))
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM transcriptions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Trim to 90% of the budget so we don't evict on every insert.
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        stale = []
+        for digest, size in conn.execute("SELECT digest, size FROM transcriptions ORDER BY last_used"):
+            stale.append((digest,))
+            freed += size
+            if freed >= target:
+                break
+        conn.executemany("DELETE FROM transcriptions WHERE digest = ?", stale)